@@ -0,0 +1,110 @@
+"""Single host collector for multi-worker deployments.
+
+Samples metrics, monitoring snapshots and the process table once for the whole host,
+evaluates alert rules, and publishes the results to the shared-memory snapshot plane
+that every uvicorn worker reads. It also owns rotation of the workers' LOG_FILE. Normally spawned by a
+worker (see CollectorSupervisor), but can be run by hand:
+
+    python -m app.collector
+"""
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+
+from app.config import settings
+from app.logging_config import rotate_log_file, setup_logging
+from app.services.alert_service import alert_service
+from app.services.metrics_service import metrics_service
+from app.services.metrics_store import metrics_store
+from app.services.monitoring_service import monitoring_service
+from app.services.process_history_service import process_history_service, rows_to_json
+from app.services.snapshot_plane import fcntl, snapshot_plane
+
+logger = logging.getLogger("app.collector")
+
+
+def _publish_loop(channel: str, collect, interval: float, stop: threading.Event) -> None:
+    while not stop.is_set():
+        started = time.monotonic()
+        try:
+            payload = json.dumps(collect(settings.SNAPSHOT_PLANE_SERVER_ID), separators=(",", ":")).encode()
+            snapshot_plane.publish(channel, payload)
+        except Exception as e:
+            logger.error("Collector failed to publish %s: %s", channel, e, exc_info=True)
+        stop.wait(max(0.0, interval - (time.monotonic() - started)))
+
+
+def _processes(server_id: str):
+    rows = process_history_service.collect()
+    if settings.ALERTS_ENABLED and alert_service.engine.needs_process_names:
+        alert_service.evaluate_processes(server_id, frozenset(row[1] for row in rows))
+    return {"timestamp": time.time(), "rows": rows_to_json(rows)}
+
+
+def _alerts(server_id: str):
+    # Rule edits made through any worker land in ALERT_RULES_FILE
+    alert_service.load_rules()
+    return alert_service.published_state()
+
+
+def main() -> int:
+    setup_logging(settings.COLLECTOR_LOG_FILE)
+    if fcntl is None:
+        logger.error("The snapshot collector requires flock support")
+        return 1
+
+    lock = open(settings.SNAPSHOT_PLANE_LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        logger.info("Another collector is already running")
+        return 0
+
+    parent = os.getppid()
+    snapshot_plane.create()
+    # The collector is the only process that writes the on-disk store in plane mode
+    if settings.METRICS_STORE_ENABLED:
+        metrics_store.start()
+    logger.info("Snapshot collector %d publishing to shared memory '%s'", os.getpid(), settings.SNAPSHOT_PLANE_NAME)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    # Metrics samples also feed the alert engine through its metrics_service listener
+    loops = [
+        ("metrics", metrics_service.get_snapshot, 1.0),
+        ("monitoring", monitoring_service.get_monitoring_snapshot, 2.0),
+    ]
+    if settings.PROCESS_HISTORY_ENABLED or settings.ALERTS_ENABLED:
+        loops.append(("processes", _processes, settings.PROCESS_HISTORY_INTERVAL_SECONDS))
+    if settings.ALERTS_ENABLED:
+        loops.append(("alerts", _alerts, 1.0))
+    threads = [
+        threading.Thread(target=_publish_loop, args=(channel, collect, interval, stop), daemon=True)
+        for channel, collect, interval in loops
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        # Exit with the worker that spawned us; a surviving worker will start a replacement
+        while not stop.is_set() and (os.getppid() == parent or parent == 1):
+            try:
+                rotate_log_file(settings.LOG_FILE, settings.LOG_MAX_BYTES, settings.LOG_BACKUP_COUNT)
+            except OSError as e:
+                logger.error("Rotating %s failed: %s", settings.LOG_FILE, e)
+            stop.wait(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop.set()
+        metrics_store.stop()
+        snapshot_plane.close()
+        lock.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "The Gauntlet MVP"
@@ -21,6 +21,114 @@ class Settings(BaseSettings):
     # List of allowed servers. In a real app this might be in a DB.
     # Format: "host:port:user:key_path" or just host for now
     SERVERS: List[str] = []
+    # Ids of the servers reported on (GET /servers). Samples for other ids are still
+    # returned to the caller but never become metric labels, alert state or stored history
+    SERVER_IDS: List[str] = ["1"]
+
+    # Logging
+    LOG_LEVEL: str = "INFO"
+    LOG_FILE: str = "backend.log"
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    LOG_BACKUP_COUNT: int = 5
+    LOG_QUEUE_SIZE: int = 10000
+    # Repeated messages (same logger + template) allowed per window before suppression
+    LOG_RATE_LIMIT_BURST: int = 10
+    LOG_RATE_LIMIT_WINDOW_SECONDS: float = 60.0
+
+    # OpenMetrics exposition (/metrics)
+    METRICS_EXPORT_ENABLED: bool = True
+    # Re-export the latest host samples (CPU, memory, disk, network) as gauges
+    METRICS_EXPORT_HOST: bool = True
+    # If set, scrapers must send "Authorization: Bearer <token>"
+    METRICS_SCRAPE_TOKEN: str = ""
+
+    # Diagnostics
+    DIAGNOSTICS_WATCHDOG_ENABLED: bool = True
+    DIAGNOSTICS_STALL_THRESHOLD_MS: float = 250.0
+    DIAGNOSTICS_PROFILE_MAX_SECONDS: float = 30.0
+
+    # Alerting
+    ALERTS_ENABLED: bool = True
+    ALERT_EVAL_INTERVAL_SECONDS: float = 5.0
+    ALERT_SERVER_IDS: List[str] = ["1"]
+    # With the snapshot plane, the rule set shared by all workers and the collector
+    ALERT_RULES_FILE: str = "alert_rules.json"
+
+    # Per-process history (memory is fixed at MAX_PROCESSES * SAMPLES * 6 doubles)
+    PROCESS_HISTORY_ENABLED: bool = True
+    PROCESS_HISTORY_INTERVAL_SECONDS: float = 2.0
+    PROCESS_HISTORY_TOP_N: int = 20
+    PROCESS_HISTORY_MAX_PROCESSES: int = 256
+    PROCESS_HISTORY_SAMPLES: int = 300
+    # Evict processes out of the top-N (or dead) for longer than this
+    PROCESS_HISTORY_RETENTION_SECONDS: float = 900.0
+
+    # Persistent metrics store: raw samples roll up into 1-minute, then 1-hour averages
+    METRICS_STORE_ENABLED: bool = True
+    METRICS_STORE_DIR: str = "data/metrics"
+    METRICS_STORE_RAW_RETENTION_HOURS: float = 48.0
+    METRICS_STORE_1M_RETENTION_DAYS: float = 30.0
+    METRICS_STORE_1H_RETENTION_DAYS: float = 365.0
+    METRICS_STORE_COMPACT_INTERVAL_SECONDS: float = 600.0
+    # Snapshots arrive from every client and loop; keep at most one raw point per metric this often
+    METRICS_STORE_MIN_SAMPLE_INTERVAL_SECONDS: float = 1.0
+
+    # Shared-memory snapshot plane for multi-worker deployments (uvicorn --workers N):
+    # one collector process samples the host and every worker reads its snapshots
+    SNAPSHOT_PLANE_ENABLED: bool = False
+    SNAPSHOT_PLANE_NAME: str = "gauntlet_snapshots"
+    SNAPSHOT_PLANE_CHANNEL_BYTES: int = 4 * 1024 * 1024
+    SNAPSHOT_PLANE_LOCK_FILE: str = "collector.lock"
+    # Older snapshots are ignored and the worker collects for itself
+    SNAPSHOT_PLANE_MAX_AGE_SECONDS: float = 5.0
+    SNAPSHOT_PLANE_SERVER_ID: str = "1"
+    # The collector logs here and rotates LOG_FILE, which the workers only append to
+    COLLECTOR_LOG_FILE: str = "collector.log"
+
+    # Command output capture: previews keep the first HEAD and last TAIL bytes, the rest
+    # is spilled to disk and paged through /commands/{server_id}/output/{output_id}
+    COMMAND_OUTPUT_HEAD_BYTES: int = 64 * 1024
+    COMMAND_OUTPUT_TAIL_BYTES: int = 64 * 1024
+    AGENT_COMMAND_OUTPUT_HEAD_BYTES: int = 4 * 1024
+    AGENT_COMMAND_OUTPUT_TAIL_BYTES: int = 4 * 1024
+    COMMAND_OUTPUT_SPILL_DIR: str = ""  # Empty uses the system temp directory
+    # Spill caps per stream and across all stored and running commands; beyond them the
+    # stored output is truncated (spill_truncated) while the preview tail stays current
+    COMMAND_OUTPUT_MAX_SPILL_BYTES: int = 256 * 1024 * 1024
+    COMMAND_OUTPUT_MAX_SPILL_TOTAL_BYTES: int = 1024 * 1024 * 1024
+    COMMAND_OUTPUT_MAX_RANGE_BYTES: int = 1024 * 1024
+    COMMAND_OUTPUT_RETENTION_SECONDS: float = 3600.0
+    COMMAND_OUTPUT_MAX_ENTRIES: int = 50
+
+    # Interactive PTY terminal sessions (/ws/terminal)
+    TERMINAL_ENABLED: bool = True
+    TERMINAL_SHELL: str = ""  # Empty uses $SHELL, then bash, then /bin/sh
+    TERMINAL_MAX_SESSIONS: int = 8
+    TERMINAL_IDLE_TIMEOUT_SECONDS: float = 900.0
+    TERMINAL_SCROLLBACK_BYTES: int = 64 * 1024
+
+    # Log follow (/ws/logs): LOG_FILE is always followable, plus these paths
+    LOG_FOLLOW_FILES: List[str] = ["/var/log/syslog", "/var/log/messages"]
+    LOG_FOLLOW_POLL_INTERVAL_SECONDS: float = 0.25
+    LOG_FOLLOW_MAX_BACKLOG_LINES: int = 5000
+    # Per-subscriber cap; lines beyond it are dropped and reported as a count
+    LOG_FOLLOW_LINES_PER_SECOND: float = 500.0
+
+    # Admission control: route -> AdmissionPolicy fields (see app/models.py)
+    ADMISSION_ENABLED: bool = True
+    ADMISSION_POLICIES: Dict[str, Dict[str, float]] = {
+        "monitoring.snapshot": {"concurrency": 4, "user_concurrency": 2, "rate": 20, "burst": 40,
+                                "user_rate": 5, "user_burst": 10, "queue": 16, "queue_timeout": 2},
+        # Held for the whole NDJSON stream
+        "monitoring.export": {"concurrency": 2, "user_concurrency": 1, "queue": 2, "queue_timeout": 2},
+        "commands.execute": {"concurrency": 4, "user_concurrency": 2, "user_rate": 2, "user_burst": 5,
+                             "queue": 8, "queue_timeout": 5},
+        "agent.chat": {"concurrency": 4, "user_concurrency": 1, "user_rate": 0.5, "user_burst": 3,
+                       "queue": 8, "queue_timeout": 10},
+        # Websocket limits apply to open connections, keyed by client address
+        "ws.metrics": {"concurrency": 64, "user_concurrency": 16, "user_rate": 2, "user_burst": 10},
+        "ws.monitoring": {"concurrency": 32, "user_concurrency": 8, "user_rate": 2, "user_burst": 10},
+    }
 
     class Config:
         env_file = ".env"
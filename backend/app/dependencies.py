@@ -3,6 +3,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.auth import verify_token
 from app.models import User
+from app.services.admission_service import AdmissionRejected, admission_controller
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
@@ -15,3 +16,20 @@ def get_current_user(token: Annotated[str, Depends(oauth2_scheme)]):
     token_data = verify_token(token, credentials_exception)
     # In real app, fetch user from DB here
     return User(username=token_data.username)
+
+def admit(route: str):
+    """Dependency that holds an admission slot for `route` for the duration of the request"""
+    async def dependency(current_user: Annotated[User, Depends(get_current_user)]):
+        try:
+            ticket = await admission_controller.acquire(route, current_user.username)
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=e.status_code,
+                detail=f"Request not admitted: {e.reason}",
+                headers={"Retry-After": str(e.retry_after)},
+            )
+        try:
+            yield
+        finally:
+            admission_controller.release(ticket)
+    return Depends(dependency)
@@ -0,0 +1,263 @@
+import asyncio
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+# Latency buckets in seconds, tuned for calls between ~1ms and ~30s
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_str(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{escape_label_value(v)}"' for n, v in zip(names, values)) + "}"
+
+
+def _fmt(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+class _Metric:
+    """Base class for a metric family with optional labels"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], "_Metric"] = {}
+        self._lock = threading.Lock()
+        self._labels = ""
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.get(key)
+                if child is None:
+                    child = self._new_child()
+                    child._labels = _label_str(self.labelnames, key)
+                    self._children[key] = child
+        return child
+
+    def _new_child(self) -> "_Metric":
+        raise NotImplementedError
+
+    def _series(self) -> Iterable["_Metric"]:
+        return self._children.values() if self.labelnames else (self,)
+
+    def render(self, out: List[str]) -> None:
+        out.append(f"# TYPE {self.name} {self.kind}")
+        out.append(f"# HELP {self.name} {self.documentation}")
+        for series in self._series():
+            series._render_samples(self.name, out)
+
+    def _render_samples(self, name: str, out: List[str]) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Counter(self.name, self.documentation)
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def _render_samples(self, name, out):
+        out.append(f"{name}_total{self._labels} {_fmt(self.value)}")
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.value = 0.0
+
+    def _new_child(self):
+        return Gauge(self.name, self.documentation)
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def _render_samples(self, name, out):
+        out.append(f"{name}{self._labels} {_fmt(self.value)}")
+
+
+class Histogram(_Metric):
+    """Histogram with fixed, preallocated buckets.
+
+    observe() does a binary search and one increment; cumulative counts are only
+    computed at render time.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._le = [_fmt(float(b)) for b in self.buckets] + ["+Inf"]
+
+    def _new_child(self):
+        return Histogram(self.name, self.documentation, buckets=self.buckets)
+
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def _render_samples(self, name, out):
+        with self._lock:
+            counts = list(self._counts)
+            total_sum = self._sum
+        labels = self._labels[1:-1] + "," if self._labels else ""
+        cumulative = 0
+        for le, count in zip(self._le, counts):
+            cumulative += count
+            out.append(f'{name}_bucket{{{labels}le="{le}"}} {cumulative}')
+        out.append(f"{name}_sum{self._labels} {_fmt(total_sum)}")
+        out.append(f"{name}_count{self._labels} {cumulative}")
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[List[str]], None]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[List[str]], None]) -> None:
+        """Register a callback that appends extra OpenMetrics lines at scrape time"""
+        self._collectors.append(collector)
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        out: List[str] = []
+        for metric in self._metrics:
+            metric.render(out)
+        for collector in self._collectors:
+            try:
+                collector(out)
+            except Exception as e:
+                logger.error("Metrics collector failed: %s", e)
+        out.append("# EOF")
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+# Backend self-instrumentation
+METRICS_SNAPSHOT_SECONDS = registry.histogram(
+    "gauntlet_metrics_snapshot_seconds", "Time spent in MetricsService.get_snapshot")
+MONITORING_SNAPSHOT_SECONDS = registry.histogram(
+    "gauntlet_monitoring_snapshot_seconds", "Time spent in MonitoringService.get_monitoring_snapshot")
+WEBSOCKET_SEND_SECONDS = registry.histogram(
+    "gauntlet_websocket_send_seconds", "Latency of websocket frame sends", ["stream"])
+WEBSOCKET_FRAMES = registry.counter(
+    "gauntlet_websocket_frames", "Websocket frames sent", ["stream"])
+WEBSOCKET_CONNECTIONS = registry.gauge(
+    "gauntlet_websocket_connections", "Currently open websocket connections", ["stream"])
+COMMAND_SECONDS = registry.histogram(
+    "gauntlet_command_duration_seconds", "Wall time of executed shell commands")
+COMMANDS = registry.counter(
+    "gauntlet_commands", "Executed shell commands by outcome", ["outcome"])
+TERMINAL_SESSIONS = registry.gauge(
+    "gauntlet_terminal_sessions", "Open PTY terminal sessions")
+ADMISSION_IN_FLIGHT = registry.gauge(
+    "gauntlet_admission_in_flight", "Admitted requests currently running", ["route"])
+ADMISSION_QUEUED = registry.gauge(
+    "gauntlet_admission_queued", "Requests waiting for a concurrency slot", ["route"])
+ADMISSION_DECISIONS = registry.counter(
+    "gauntlet_admission_decisions", "Admission outcomes", ["route", "outcome"])
+AGENT_CHAT_SECONDS = registry.histogram(
+    "gauntlet_agent_chat_seconds", "End-to-end time of AgentService.chat")
+AGENT_LLM_SECONDS = registry.histogram(
+    "gauntlet_agent_llm_seconds", "Time spent waiting on the LLM")
+AGENT_TOOL_CALLS = registry.counter(
+    "gauntlet_agent_tool_calls", "Agent tool invocations", ["tool"])
+EVENT_LOOP_LAG_SECONDS = registry.histogram(
+    "gauntlet_event_loop_lag_seconds", "Delay between scheduled and actual event loop wakeups",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+
+class EventLoopLagMonitor:
+    """Periodically measures how late the event loop wakes a sleeping task"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            EVENT_LOOP_LAG_SECONDS.observe(max(0.0, time.perf_counter() - start - self.interval))
+
+
+event_loop_lag_monitor = EventLoopLagMonitor()
@@ -0,0 +1,194 @@
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, WatchedFileHandler
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+
+class RateLimitFilter(logging.Filter):
+    """Suppress repetitive messages from hot paths.
+
+    Records are keyed by (logger name, level, message template), so calls must use
+    %-style arguments rather than f-strings for repeats to be recognised. Each key may
+    emit `burst` records per `window` seconds; ERROR and above always pass. Past
+    MAX_KEYS the least recently seen key is forgotten, so one-off messages cycle out
+    while hot ones keep their suppression state.
+    """
+
+    MAX_KEYS = 2048
+
+    def __init__(self, burst: int, window: float):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self._lock = threading.Lock()
+        # key -> [window_start, emitted_in_window, suppressed_total]
+        self._keys: "OrderedDict[Tuple[str, int, str], list]" = OrderedDict()
+        self.suppressed = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.burst <= 0 or record.levelno >= logging.ERROR:
+            return True
+
+        key = (record.name, record.levelno, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None:
+                if len(self._keys) >= self.MAX_KEYS:
+                    self._keys.popitem(last=False)
+                self._keys[key] = [now, 1, 0]
+                return True
+            self._keys.move_to_end(key)
+            if now - entry[0] >= self.window:
+                entry[0] = now
+                entry[1] = 0
+            if entry[1] < self.burst:
+                entry[1] += 1
+                return True
+            entry[2] += 1
+            self.suppressed += 1
+            return False
+
+    def top_suppressed(self, limit: int = 10):
+        with self._lock:
+            items = [(key, entry[2]) for key, entry in self._keys.items() if entry[2]]
+        items.sort(key=lambda item: item[1], reverse=True)
+        return [
+            {"logger": name, "level": logging.getLevelName(level), "message": msg, "suppressed": count}
+            for (name, level, msg), count in items[:limit]
+        ]
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Queue handler that never blocks the caller.
+
+    When the queue is full the record is dropped and counted. Arguments are merged
+    into the message before enqueueing, since they may be mutated by the time the
+    writer thread runs; traceback rendering and the final layout stay on the writer
+    thread.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.enqueued = 0
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.args:
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+            self.enqueued += 1
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """Routes all log records through a bounded queue to a background writer thread"""
+
+    def __init__(self):
+        self.queue_handler: Optional[NonBlockingQueueHandler] = None
+        self.rate_limiter: Optional[RateLimitFilter] = None
+        self.listener: Optional[QueueListener] = None
+
+    def start(self, log_file: Optional[str] = None, rotate: bool = True) -> None:
+        """Start the writer; with rotate=False another process rotates the file (see rotate_log_file)"""
+        if self.listener:
+            return
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        if rotate:
+            file_handler = RotatingFileHandler(
+                log_file or settings.LOG_FILE,
+                maxBytes=settings.LOG_MAX_BYTES,
+                backupCount=settings.LOG_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+        else:
+            # Reopens the path after the rotating process renames the file
+            file_handler = WatchedFileHandler(log_file or settings.LOG_FILE, encoding="utf-8")
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(formatter)
+
+        log_queue: queue.Queue = queue.Queue(maxsize=settings.LOG_QUEUE_SIZE)
+        self.rate_limiter = RateLimitFilter(
+            burst=settings.LOG_RATE_LIMIT_BURST,
+            window=settings.LOG_RATE_LIMIT_WINDOW_SECONDS,
+        )
+        self.queue_handler = NonBlockingQueueHandler(log_queue)
+        self.queue_handler.addFilter(self.rate_limiter)
+
+        root = logging.getLogger()
+        root.setLevel(settings.LOG_LEVEL.upper())
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(self.queue_handler)
+
+        self.listener = QueueListener(log_queue, file_handler, stream_handler, respect_handler_level=True)
+        self.listener.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Flush queued records and stop the writer thread"""
+        if not self.listener:
+            return
+        self.listener.stop()
+        for handler in self.listener.handlers:
+            handler.close()
+        self.listener = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        handler = self.queue_handler
+        limiter = self.rate_limiter
+        return {
+            "running": self.listener is not None,
+            "queue_size": handler.queue.qsize() if handler else 0,
+            "queue_capacity": settings.LOG_QUEUE_SIZE,
+            "enqueued": handler.enqueued if handler else 0,
+            "dropped": handler.dropped if handler else 0,
+            "suppressed": limiter.suppressed if limiter else 0,
+            "top_suppressed": limiter.top_suppressed() if limiter else [],
+        }
+
+
+logging_pipeline = LoggingPipeline()
+
+
+def setup_logging(log_file: Optional[str] = None, rotate: bool = True) -> None:
+    logging_pipeline.start(log_file, rotate)
+
+
+def rotate_log_file(path: str, max_bytes: int, backup_count: int) -> bool:
+    """Size-based rotation of a file that other processes append to via WatchedFileHandler.
+
+    Backups are named like RotatingFileHandler's (path.1 is the newest). Only one
+    process may call this for a given file.
+    """
+    try:
+        if max_bytes <= 0 or os.path.getsize(path) < max_bytes:
+            return False
+    except OSError:
+        return False
+    if backup_count <= 0:
+        os.truncate(path, 0)
+        return True
+    for index in range(backup_count - 1, 0, -1):
+        source = f"{path}.{index}"
+        if os.path.exists(source):
+            os.replace(source, f"{path}.{index + 1}")
+    os.replace(path, f"{path}.1")
+    return True
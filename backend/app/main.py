@@ -1,18 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
-from app.routers import auth_routes, server_routes, agent_routes, metrics_routes, websocket_routes, command_routes, monitoring_routes
+from app.instrumentation import event_loop_lag_monitor
+from app.services.diagnostics_service import diagnostics_service
+from app.services.alert_service import alert_service
+from app.services.process_history_service import process_history_service
+from app.services.metrics_store import metrics_store
+from app.services.snapshot_plane import collector_supervisor, fcntl
+from app.services.terminal_service import terminal_service
+from app.services.output_capture import output_store
+from app.logging_config import setup_logging
+from app.routers import auth_routes, server_routes, agent_routes, metrics_routes, websocket_routes, command_routes, monitoring_routes, diagnostics_routes, exposition_routes, alert_routes
 import logging
 
-# Configure Logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-    handlers=[
-        logging.FileHandler("backend.log"),
-        logging.StreamHandler()
-    ]
-)
+# Configure Logging (queue-backed, written by a background thread; flushed at exit).
+# With the snapshot plane several workers append to LOG_FILE and the collector rotates it.
+setup_logging(rotate=not (settings.SNAPSHOT_PLANE_ENABLED and fcntl is not None))
 logger = logging.getLogger(__name__)
 
 app = FastAPI(title=settings.PROJECT_NAME)
@@ -45,6 +48,37 @@ app.include_router(monitoring_routes.router, prefix="/monitoring", tags=["monito
 app.include_router(agent_routes.router, prefix="/agent", tags=["agent"])
 app.include_router(command_routes.router, prefix="/commands", tags=["commands"])
 app.include_router(websocket_routes.router, prefix="/ws", tags=["websockets"])
+app.include_router(alert_routes.router, prefix="/alerts", tags=["alerts"])
+app.include_router(diagnostics_routes.router, prefix="/diagnostics", tags=["diagnostics"])
+if settings.METRICS_EXPORT_ENABLED:
+    app.include_router(exposition_routes.router, tags=["observability"])
+
+@app.on_event("startup")
+async def start_background_tasks():
+    event_loop_lag_monitor.start()
+    diagnostics_service.start()
+    if settings.TERMINAL_ENABLED:
+        terminal_service.start()
+    plane_started = settings.SNAPSHOT_PLANE_ENABLED and collector_supervisor.start()
+    # With the snapshot plane the collector process samples the host, evaluates alerts and
+    # owns the on-disk store for all workers; they follow what it publishes
+    if settings.ALERTS_ENABLED:
+        alert_service.start(shared=plane_started)
+    if settings.PROCESS_HISTORY_ENABLED:
+        process_history_service.start(shared=plane_started)
+    if settings.METRICS_STORE_ENABLED and not plane_started:
+        metrics_store.start()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await event_loop_lag_monitor.stop()
+    await diagnostics_service.stop()
+    await alert_service.stop()
+    await process_history_service.stop()
+    await terminal_service.stop()
+    await collector_supervisor.stop()
+    metrics_store.stop()
+    output_store.clear()
 
 @app.get("/")
 def read_root():
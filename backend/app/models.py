@@ -1,4 +1,5 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, PositiveInt
+from typing import List, Literal, Optional
 
 class Token(BaseModel):
     access_token: str
@@ -38,6 +39,16 @@ class SystemMetrics(BaseModel):
     # Network
     network_sent_mb: float
     network_recv_mb: float
+
+    # Per-second rates since the previous sample (0.0 on the first sample)
+    network_sent_bytes_per_sec: float = 0.0
+    network_recv_bytes_per_sec: float = 0.0
+    network_packets_sent_per_sec: float = 0.0
+    network_packets_recv_per_sec: float = 0.0
+    disk_read_bytes_per_sec: float = 0.0
+    disk_write_bytes_per_sec: float = 0.0
+    disk_read_iops: float = 0.0
+    disk_write_iops: float = 0.0
     
     # Top processes
     top_processes: list
@@ -49,6 +60,11 @@ class CommandResponse(BaseModel):
     output: str
     exit_code: int
     error: str = ""
+    # Set when output or error is a head/tail preview; page through the rest by id
+    truncated: bool = False
+    output_id: Optional[str] = None
+    output_bytes: int = 0
+    error_bytes: int = 0
 
 class ChatRequest(BaseModel):
     message: str
@@ -56,3 +72,49 @@ class ChatRequest(BaseModel):
 
 class ChatResponse(BaseModel):
     response: str
+
+class AlertRule(BaseModel):
+    id: str = ""
+    name: str
+    # "threshold": aggregate of a numeric snapshot field; "process_absent": no process with this name
+    kind: Literal["threshold", "process_absent"] = "threshold"
+    metric: str = ""
+    aggregation: Literal["last", "avg", "min", "max"] = "last"
+    operator: Literal[">", ">=", "<", "<="] = ">"
+    threshold: float = 0.0
+    # Aggregates other than "last" are only evaluated once the window holds this much history
+    window_seconds: float = 0.0
+    # Condition must hold this long before the alert moves from pending to firing
+    for_seconds: float = 0.0
+    process_name: str = ""
+    server_id: str = "*"
+    severity: Literal["info", "warning", "critical"] = "warning"
+
+class ProcessBatchRequest(BaseModel):
+    # Selectors are combined: explicit PIDs + a process tree + a name/username filter
+    # psutil treats 0 and negative PIDs as invalid input rather than a missing process
+    pids: List[PositiveInt] = []
+    tree_root: Optional[PositiveInt] = None
+    include_root: bool = True
+    name: Optional[str] = None
+    username: Optional[str] = None
+    # PID 1 and the backend's ancestors are skipped unless this is set
+    allow_protected: bool = False
+    action: Literal["terminate", "kill", "suspend", "resume"] = "terminate"
+    # Seconds to wait for terminate/kill to take effect
+    timeout: float = 5.0
+    # Kill processes still alive after a terminate times out
+    escalate: bool = True
+    dry_run: bool = False
+
+class AdmissionPolicy(BaseModel):
+    # 0 disables a limit. Rates are requests per second; bursts are bucket sizes
+    concurrency: int = 0
+    user_concurrency: int = 0
+    rate: float = 0.0
+    burst: float = 0.0
+    user_rate: float = 0.0
+    user_burst: float = 0.0
+    # Callers beyond `concurrency` wait in a FIFO of this length for up to queue_timeout
+    queue: int = 0
+    queue_timeout: float = 0.0
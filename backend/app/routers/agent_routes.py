@@ -1,12 +1,12 @@
 from fastapi import APIRouter, Depends
-from app.dependencies import get_current_user
+from app.dependencies import admit, get_current_user
 from app.models import ChatRequest, ChatResponse, User
 
 from app.services.agent_service import agent_service
 
 router = APIRouter()
 
-@router.post("/chat", response_model=ChatResponse)
+@router.post("/chat", response_model=ChatResponse, dependencies=[admit("agent.chat")])
 async def agent_chat(request: ChatRequest, current_user: User = Depends(get_current_user)):
     response = await agent_service.chat(request.message, request.server_id)
     return ChatResponse(response=response)
@@ -0,0 +1,37 @@
+from typing import List
+from fastapi import APIRouter, Depends, HTTPException
+from app.dependencies import get_current_user
+from app.models import AlertRule, User
+from app.services.alert_service import alert_service
+
+router = APIRouter()
+
+@router.get("/rules", response_model=List[AlertRule])
+async def list_rules(current_user: User = Depends(get_current_user)):
+    """List alert rules"""
+    return alert_service.list_rules()
+
+@router.post("/rules", response_model=AlertRule)
+async def create_rule(rule: AlertRule, current_user: User = Depends(get_current_user)):
+    """Create or replace an alert rule"""
+    try:
+        return alert_service.add_rule(rule)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/rules/{rule_id}")
+async def delete_rule(rule_id: str, current_user: User = Depends(get_current_user)):
+    """Delete an alert rule and clear its alert state"""
+    if not alert_service.remove_rule(rule_id):
+        raise HTTPException(status_code=404, detail="Rule not found")
+    return {"status": "success", "message": f"Rule {rule_id} deleted"}
+
+@router.get("/active")
+async def get_active_alerts(current_user: User = Depends(get_current_user)):
+    """Get pending and firing alerts"""
+    return alert_service.active_alerts()
+
+@router.get("/events")
+async def get_recent_events(current_user: User = Depends(get_current_user)):
+    """Get the most recent alert state transitions"""
+    return alert_service.events()
@@ -1,13 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.dependencies import get_current_user
+from typing import Literal
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.dependencies import admit, get_current_user
 from app.models import CommandRequest, CommandResponse, User
+import asyncio
 import subprocess
 import logging
+import time
+from app.instrumentation import COMMAND_SECONDS, COMMANDS
+from app.services.output_capture import output_store, run_command
+from app.services.terminal_service import terminal_service
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.post("/{server_id}/execute", response_model=CommandResponse)
+@router.post("/{server_id}/execute", response_model=CommandResponse, dependencies=[admit("commands.execute")])
 async def execute_command(
     server_id: str,
     command_request: CommandRequest,
@@ -18,33 +24,75 @@ async def execute_command(
         # WARNING: All commands are now allowed - use with caution!
         # For production, implement proper command validation and sandboxing
         
-        logger.info(f"Executing command by {current_user.username}: {command_request.command}")
+        logger.info("Executing command by %s: %s", current_user.username, command_request.command)
         
-        # Execute command
-        result = subprocess.run(
-            command_request.command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=30,  # Increased timeout for longer commands
-            cwd=None  # Use current working directory
-        )
+        # Execute command; output beyond the preview size is spilled to disk
+        start = time.perf_counter()
+        try:
+            result = await asyncio.to_thread(run_command, command_request.command, 30)
+        finally:
+            COMMAND_SECONDS.observe(time.perf_counter() - start)
+        COMMANDS.labels("success" if result.returncode == 0 else "failure").inc()
         
-        logger.info(f"Command completed with exit code: {result.returncode}")
-        logger.debug(f"Output: {result.stdout[:200]}...")  # Log first 200 chars
+        logger.info("Command completed with exit code: %s", result.returncode)
+        stdout = result.stdout.preview()
+        stderr = result.stderr.preview()
+        logger.debug("Output: %s...", stdout[:200])  # Log first 200 chars
         
         # Get output - prefer stdout, fallback to stderr, then default message
-        output = result.stdout.strip() if result.stdout.strip() else (
-            result.stderr.strip() if result.stderr.strip() else "Command executed successfully (no output)"
+        output = stdout.strip() if stdout.strip() else (
+            stderr.strip() if stderr.strip() else "Command executed successfully (no output)"
         )
         
         return CommandResponse(
             output=output,
             exit_code=result.returncode,
-            error=result.stderr if result.returncode != 0 else ""
+            error=stderr if result.returncode != 0 else "",
+            truncated=result.truncated,
+            output_id=result.output_id,
+            output_bytes=result.stdout.total,
+            error_bytes=result.stderr.total
         )
     except subprocess.TimeoutExpired:
+        COMMANDS.labels("timeout").inc()
         raise HTTPException(status_code=408, detail="Command timed out")
     except Exception as e:
-        logger.error(f"Error executing command: {e}")
+        COMMANDS.labels("error").inc()
+        logger.error("Error executing command: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/{server_id}/output/{output_id}")
+async def get_command_output(
+    server_id: str,
+    output_id: str,
+    stream: Literal["stdout", "stderr"] = "stdout",
+    offset: int = Query(0, ge=0),
+    length: int = Query(64 * 1024, ge=1),
+    current_user: User = Depends(get_current_user)
+):
+    """Read a byte range of a truncated command's full output; continue from next_offset"""
+    chunk = await asyncio.to_thread(output_store.read, output_id, stream, offset, length)
+    if chunk is None:
+        raise HTTPException(status_code=404, detail="Output not found or expired")
+    return chunk
+
+@router.get("/{server_id}/output/{output_id}/info")
+async def get_command_output_info(server_id: str, output_id: str, current_user: User = Depends(get_current_user)):
+    """Sizes of a truncated command's stored output"""
+    info = output_store.describe(output_id)
+    if info is None:
+        raise HTTPException(status_code=404, detail="Output not found or expired")
+    return info
+
+@router.get("/{server_id}/terminals")
+async def list_terminal_sessions(server_id: str, current_user: User = Depends(get_current_user)):
+    """List the caller's PTY terminal sessions"""
+    return terminal_service.list(current_user.username)
+
+@router.delete("/{server_id}/terminals/{session_id}")
+async def close_terminal_session(server_id: str, session_id: str, current_user: User = Depends(get_current_user)):
+    """Kill a terminal session's shell"""
+    if not any(session["id"] == session_id for session in terminal_service.list(current_user.username)):
+        raise HTTPException(status_code=404, detail="Session not found")
+    terminal_service.close(session_id)
+    return {"message": f"Session {session_id} closed"}
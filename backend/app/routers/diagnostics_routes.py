@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from app.dependencies import get_current_user
+from app.logging_config import logging_pipeline
+from app.models import User
+from app.services.admission_service import admission_controller
+from app.services.log_follow_service import log_follow_service
+from app.services.diagnostics_service import SamplingProfiler, diagnostics_service
+from app.services.metrics_store import metrics_store
+
+router = APIRouter()
+
+@router.get("/logging")
+async def get_logging_stats(current_user: User = Depends(get_current_user)):
+    """Get log pipeline queue depth and dropped/suppressed message counts"""
+    return logging_pipeline.get_stats()
+
+@router.get("/log-follow")
+async def get_log_follow_stats(current_user: User = Depends(get_current_user)):
+    """Get followable log files and the shared readers currently following them"""
+    return log_follow_service.stats()
+
+@router.get("/metrics-store")
+async def get_metrics_store_stats(current_user: User = Depends(get_current_user)):
+    """Get on-disk metrics store size and writer counters"""
+    return metrics_store.stats()
+
+@router.get("/admission")
+async def get_admission_stats(current_user: User = Depends(get_current_user)):
+    """Get in-flight, queued, admitted and rejected counts per admission-controlled route"""
+    return admission_controller.stats()
+
+@router.get("/stalls")
+async def get_event_loop_stalls(current_user: User = Depends(get_current_user)):
+    """Get recent event loop stalls with the stack that was blocking"""
+    return diagnostics_service.get_stalls()
+
+@router.post("/profile")
+async def run_profile(
+    duration: float = Query(5.0, gt=0, description="Seconds to sample (capped server-side)"),
+    interval_ms: float = Query(5.0, ge=1, description="Sampling interval in milliseconds"),
+    loop_only: bool = Query(False, description="Only sample the event loop thread"),
+    format: str = Query("collapsed", pattern="^(collapsed|json)$"),
+    current_user: User = Depends(get_current_user)
+):
+    """Run a time-boxed sampling profile; collapsed output feeds flamegraph.pl / speedscope"""
+    if diagnostics_service.profiler.busy:
+        raise HTTPException(status_code=409, detail="A profile is already running")
+    try:
+        result = await diagnostics_service.run_profile(duration, interval_ms / 1000, loop_only)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    if format == "json":
+        return {
+            "duration": result["duration"],
+            "interval": result["interval"],
+            "samples": result["samples"],
+            "stacks": dict(result["stacks"].most_common()),
+        }
+    return PlainTextResponse(SamplingProfiler.to_collapsed(result["stacks"]))
@@ -0,0 +1,67 @@
+import time
+from typing import List, Optional
+from fastapi import APIRouter, Header, HTTPException, Response, status
+from app.config import settings
+from app.instrumentation import OPENMETRICS_CONTENT_TYPE, escape_label_value, registry
+from app.services.metrics_service import metrics_service
+from app.services.snapshot_plane import published_snapshot
+
+router = APIRouter()
+
+# snapshot field -> (metric name, help)
+HOST_GAUGES = {
+    "cpu_usage": ("gauntlet_host_cpu_usage_percent", "Host CPU utilisation"),
+    "memory_usage": ("gauntlet_host_memory_usage_percent", "Host memory utilisation"),
+    "disk_usage": ("gauntlet_host_disk_usage_percent", "Root filesystem utilisation"),
+    "available_memory_gb": ("gauntlet_host_memory_available_gigabytes", "Available memory"),
+    "free_disk_gb": ("gauntlet_host_disk_free_gigabytes", "Free space on the root filesystem"),
+    "network_sent_bytes_per_sec": ("gauntlet_host_network_sent_bytes_per_second", "Network send throughput"),
+    "network_recv_bytes_per_sec": ("gauntlet_host_network_received_bytes_per_second", "Network receive throughput"),
+    "disk_read_bytes_per_sec": ("gauntlet_host_disk_read_bytes_per_second", "Disk read throughput"),
+    "disk_write_bytes_per_sec": ("gauntlet_host_disk_write_bytes_per_second", "Disk write throughput"),
+}
+
+# Cumulative since boot, so exposed as counters (with the _total suffix)
+HOST_COUNTERS = {
+    "network_sent_mb": ("gauntlet_host_network_sent_megabytes", "Megabytes sent since boot"),
+    "network_recv_mb": ("gauntlet_host_network_received_megabytes", "Megabytes received since boot"),
+}
+
+def collect_host_metrics(out: List[str]):
+    """Render the most recent MetricsService samples without triggering a new collection"""
+    latest = dict(metrics_service.latest)
+    published = published_snapshot("metrics")
+    if published is not None:
+        latest[settings.SNAPSHOT_PLANE_SERVER_ID] = published
+    # Only configured servers become label values; ids from request paths are untrusted
+    latest = [
+        (escape_label_value(server_id), sample)
+        for server_id, sample in latest.items() if server_id in settings.SERVER_IDS
+    ]
+    if not latest:
+        return
+    now = time.time()
+    for field, (name, doc) in HOST_GAUGES.items():
+        out.append(f"# TYPE {name} gauge")
+        out.append(f"# HELP {name} {doc}")
+        for server_id, (_, snapshot) in latest:
+            out.append(f'{name}{{server_id="{server_id}"}} {snapshot.get(field, 0)}')
+    for field, (name, doc) in HOST_COUNTERS.items():
+        out.append(f"# TYPE {name} counter")
+        out.append(f"# HELP {name} {doc}")
+        for server_id, (_, snapshot) in latest:
+            out.append(f'{name}_total{{server_id="{server_id}"}} {snapshot.get(field, 0)}')
+    out.append("# TYPE gauntlet_host_sample_age_seconds gauge")
+    out.append("# HELP gauntlet_host_sample_age_seconds Age of the latest host sample")
+    for server_id, (timestamp, _) in latest:
+        out.append(f'gauntlet_host_sample_age_seconds{{server_id="{server_id}"}} {round(now - timestamp, 3)}')
+
+if settings.METRICS_EXPORT_HOST:
+    registry.add_collector(collect_host_metrics)
+
+@router.get("/metrics", include_in_schema=False)
+async def get_openmetrics(authorization: Optional[str] = Header(default=None)):
+    """OpenMetrics exposition of backend instrumentation and host metrics"""
+    if settings.METRICS_SCRAPE_TOKEN and authorization != f"Bearer {settings.METRICS_SCRAPE_TOKEN}":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid scrape token")
+    return Response(content=registry.render(), media_type=OPENMETRICS_CONTENT_TYPE)
@@ -1,12 +1,41 @@
-from fastapi import APIRouter, Depends
+import asyncio
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from app.dependencies import get_current_user
 from app.models import SystemMetrics, User
 from app.services.metrics_service import metrics_service
+from app.services.metrics_store import metrics_store
+from app.services.snapshot_plane import published_payload
 
 router = APIRouter()
 
 @router.get("/{server_id}/snapshot", response_model=SystemMetrics)
 async def get_metrics_snapshot(server_id: str, current_user: User = Depends(get_current_user)):
     """Get real system metrics"""
+    payload = published_payload("metrics")
+    if payload is not None:
+        return Response(content=payload, media_type="application/json")
     metrics = metrics_service.get_snapshot(server_id)
     return SystemMetrics(**metrics)
+
+@router.get("/{server_id}/history")
+async def get_metrics_history(
+    server_id: str,
+    metric: str,
+    start: Optional[float] = Query(None, description="Unix seconds; defaults to one hour ago"),
+    end: Optional[float] = Query(None, description="Unix seconds; defaults to now"),
+    max_points: int = Query(1000, ge=1, le=100000),
+    current_user: User = Depends(get_current_user)
+):
+    """Get stored history for one metric, served from raw samples or rollups depending on age"""
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 3600
+    if start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    return await asyncio.to_thread(metrics_store.query, server_id, metric, start, end, max_points)
+
+@router.get("/{server_id}/history/metrics")
+async def list_stored_metrics(server_id: str, current_user: User = Depends(get_current_user)):
+    """List metrics with stored history for a server"""
+    return metrics_store.list_metrics(server_id)
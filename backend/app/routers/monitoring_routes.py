@@ -1,22 +1,81 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.dependencies import get_current_user
-from app.models import User
+import asyncio
+from collections import Counter
+from functools import partial
+from typing import Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from app.dependencies import admit, get_current_user
+from app.models import ProcessBatchRequest, User
 from app.services.monitoring_service import monitoring_service
+from app.services.process_history_service import process_history_service
+from app.services.snapshot_plane import published_payload
+from app.services.export_service import KIND_FILES, iter_connections, iter_processes, stream_ndjson
 import logging
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-@router.get("/{server_id}/snapshot")
+@router.get("/{server_id}/snapshot", dependencies=[admit("monitoring.snapshot")])
 async def get_monitoring_snapshot(server_id: str, current_user: User = Depends(get_current_user)):
     """Get comprehensive monitoring snapshot"""
+    payload = published_payload("monitoring")
+    if payload is not None:
+        return Response(content=payload, media_type="application/json")
     try:
-        data = monitoring_service.get_monitoring_snapshot(server_id)
+        # Off the event loop so the admission concurrency limit is what bounds the work
+        data = await asyncio.to_thread(monitoring_service.get_monitoring_snapshot, server_id)
         return data
     except Exception as e:
-        logger.error(f"Error getting monitoring snapshot: {e}")
+        logger.error("Error getting monitoring snapshot: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/{server_id}/export/processes", dependencies=[admit("monitoring.export")])
+async def export_processes(
+    server_id: str,
+    name: Optional[str] = Query(None, description="Case-insensitive substring of the process name"),
+    username: Optional[str] = None,
+    status: Optional[str] = None,
+    min_cpu: float = 0.0,
+    min_memory: float = 0.0,
+    cmdline: bool = Query(False, description="Include command lines (slower)"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the full process table as NDJSON, one process per line"""
+    rows = partial(iter_processes, name, username, status, min_cpu, min_memory, cmdline)
+    return StreamingResponse(stream_ndjson(rows), media_type="application/x-ndjson")
+
+@router.get("/{server_id}/export/connections", dependencies=[admit("monitoring.export")])
+async def export_connections(
+    server_id: str,
+    kind: Literal[tuple(KIND_FILES)] = "inet",
+    status: Optional[str] = Query(None, description="e.g. ESTABLISHED, LISTEN, TIME_WAIT"),
+    pid: Optional[int] = None,
+    port: Optional[int] = Query(None, description="Local or remote port"),
+    remote_ip: Optional[str] = Query(None, description="Prefix of the remote address"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the full socket table as NDJSON, one connection per line"""
+    rows = partial(iter_connections, kind, status, pid, port, remote_ip)
+    return StreamingResponse(stream_ndjson(rows), media_type="application/x-ndjson")
+
+@router.get("/{server_id}/process/{pid}/history")
+async def get_process_history(
+    server_id: str,
+    pid: int,
+    create_time: Optional[float] = None,
+    current_user: User = Depends(get_current_user)
+):
+    """Get recorded CPU/RSS/threads/IO history for a process (latest incarnation of the PID by default)"""
+    history = process_history_service.get_history(pid, create_time)
+    if history is None:
+        raise HTTPException(status_code=404, detail=f"No history recorded for process {pid}")
+    return history
+
+@router.get("/{server_id}/process-history/stats")
+async def get_process_history_stats(server_id: str, current_user: User = Depends(get_current_user)):
+    """Get process history store occupancy and memory footprint"""
+    return process_history_service.store.stats()
+
 @router.post("/{server_id}/process/{pid}/terminate")
 async def terminate_process(server_id: str, pid: int, current_user: User = Depends(get_current_user)):
     """Terminate a process gracefully"""
@@ -48,3 +107,36 @@ async def resume_process(server_id: str, pid: int, current_user: User = Depends(
     if not success:
         raise HTTPException(status_code=400, detail="Failed to resume process")
     return {"status": "success", "message": f"Process {pid} resumed"}
+
+@router.post("/{server_id}/processes/batch")
+async def batch_process_action(server_id: str, request: ProcessBatchRequest, current_user: User = Depends(get_current_user)):
+    """Apply terminate/kill/suspend/resume to many processes at once with a per-PID report"""
+    if not (request.pids or request.tree_root is not None or request.name or request.username):
+        raise HTTPException(status_code=400, detail="Specify pids, tree_root, name or username")
+    if request.timeout < 0 or request.timeout > 60:
+        raise HTTPException(status_code=400, detail="timeout must be between 0 and 60 seconds")
+
+    procs = await asyncio.to_thread(
+        monitoring_service.select_processes,
+        request.pids, request.tree_root, request.include_root, request.name, request.username,
+        request.allow_protected
+    )
+    if request.dry_run:
+        return {"action": request.action, "dry_run": True, "matched": [proc.pid for proc in procs]}
+
+    logger.info("Batch %s by %s on %d processes", request.action, current_user.username, len(procs))
+    results = await asyncio.to_thread(
+        monitoring_service.signal_processes, procs, request.action, request.timeout, request.escalate
+    )
+    matched = {proc.pid for proc in procs}
+    protected = set() if request.allow_protected else monitoring_service.protected_pids()
+    results.extend(
+        {"pid": pid, "name": None, "outcome": "protected" if pid in protected else "not_found", "exit_code": None}
+        for pid in dict.fromkeys(request.pids) if pid not in matched
+    )
+    return {
+        "action": request.action,
+        "matched": len(procs),
+        "summary": dict(Counter(result["outcome"] for result in results)),
+        "results": results,
+    }
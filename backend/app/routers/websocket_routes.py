@@ -1,52 +1,362 @@
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from typing import Optional
 import asyncio
 import json
 import logging
+import math
+import os
+import struct
+import time
+from app.instrumentation import WEBSOCKET_CONNECTIONS, WEBSOCKET_FRAMES, WEBSOCKET_SEND_SECONDS
 from app.services.metrics_service import metrics_service
 from app.services.monitoring_service import monitoring_service
+from app.services.alert_service import alert_service
+from app.services.snapshot_plane import published_payload, published_snapshot
+from app.services.terminal_service import TerminalError, terminal_service
+from app.services.admission_service import AdmissionRejected, admission_controller
+from app.services.log_follow_service import MIN_LINES_PER_SECOND, LogSubscriber, log_follow_service
+from app.auth import verify_token
+from app.config import settings
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
+MIN_INTERVAL = 0.5
+MAX_INTERVAL = 60.0
+
+def parse_subscription(message) -> dict:
+    """Validate a {"type": "subscribe", "fields": [...], "groups": [...], "interval": s} message"""
+    if not isinstance(message, dict) or message.get("type", "subscribe") != "subscribe":
+        raise ValueError("Expected a subscribe message")
+    groups, fields = metrics_service.resolve_projection(message.get("fields"), message.get("groups"))
+    interval = float(message.get("interval", 1.0))
+    if not math.isfinite(interval):
+        raise ValueError("interval must be a finite number of seconds")
+    return {"groups": groups, "fields": fields, "interval": min(max(interval, MIN_INTERVAL), MAX_INTERVAL)}
+
+async def admit_websocket(websocket: WebSocket, route: str):
+    """(admitted, ticket) for the connection's lifetime; closes the socket with 1013 if rejected"""
+    try:
+        return True, await admission_controller.acquire(route, websocket.client.host if websocket.client else "unknown")
+    except AdmissionRejected as e:
+        await websocket.close(code=1013, reason=f"{e.reason}; retry after {e.retry_after}s")
+        return False, None
+
 @router.websocket("/metrics/{server_id}")
 async def websocket_endpoint(websocket: WebSocket, server_id: str):
+    """Streams metrics every second.
+
+    Clients may send {"type": "subscribe", "fields": [...], "groups": [...], "interval": s}
+    at any time; the server then collects only what those fields need and sends only
+    those fields. Without a subscription the full snapshot is sent.
+    """
     await websocket.accept()
-    logger.info(f"WebSocket connected for server {server_id}")
+    admitted, ticket = await admit_websocket(websocket, "ws.metrics")
+    if not admitted:
+        return
+    logger.info("WebSocket connected for server %s", server_id)
+    connections = WEBSOCKET_CONNECTIONS.labels("metrics")
+    send_seconds = WEBSOCKET_SEND_SECONDS.labels("metrics")
+    frames = WEBSOCKET_FRAMES.labels("metrics")
+    connections.inc()
+
+    state = {"subscription": None, "replies": []}
+    changed = asyncio.Event()
+
+    async def receive_subscriptions():
+        try:
+            while True:
+                try:
+                    message = json.loads(await websocket.receive_text())
+                    state["subscription"] = parse_subscription(message)
+                    state["replies"].append({"type": "subscribed", **state["subscription"]})
+                except (ValueError, TypeError) as e:
+                    state["replies"].append({"type": "error", "detail": str(e)})
+                changed.set()
+        finally:
+            changed.set()
+
+    receiver = asyncio.create_task(receive_subscriptions())
     try:
         while True:
             # In a real scenario, this would authenticate the user first (via query param token)
-            # Fetch metrics
-            data = metrics_service.get_snapshot(server_id)
-            await websocket.send_json(data)
-            await asyncio.sleep(1) # Send every second
+            if receiver.done():
+                receiver.result()  # Re-raise WebSocketDisconnect
+            while state["replies"]:
+                await websocket.send_json(state["replies"].pop(0))
+
+            # Prefer the collector's shared snapshot; otherwise collect off the event
+            # loop, since cpu_percent(interval=1) blocks its thread
+            subscription = state["subscription"]
+            if subscription is None:
+                interval = 1.0
+                payload = published_payload("metrics")
+                if payload is None:
+                    payload = json.dumps(await asyncio.to_thread(metrics_service.get_snapshot, server_id))
+                else:
+                    payload = payload.decode()
+            else:
+                interval = subscription["interval"]
+                published = published_snapshot("metrics")
+                if published is not None:
+                    data = {field: published[1][field] for field in subscription["fields"]}
+                else:
+                    data = await asyncio.to_thread(
+                        metrics_service.get_projection, server_id, subscription["groups"], subscription["fields"]
+                    )
+                payload = json.dumps(data)
+
+            start = time.perf_counter()
+            await websocket.send_text(payload)
+            send_seconds.observe(time.perf_counter() - start)
+            frames.inc()
+
+            # Sleep until the next frame, waking early if the subscription changes
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for server {server_id}")
+        logger.info("WebSocket disconnected for server %s", server_id)
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         await websocket.close()
+    finally:
+        receiver.cancel()
+        connections.dec()
+        admission_controller.release(ticket)
 
 @router.websocket("/monitoring/{server_id}")
 async def monitoring_websocket(websocket: WebSocket, server_id: str):
     """WebSocket endpoint for real-time monitoring data"""
     await websocket.accept()
-    logger.info(f"Monitoring WebSocket connected for server {server_id}")
+    admitted, ticket = await admit_websocket(websocket, "ws.monitoring")
+    if not admitted:
+        return
+    logger.info("Monitoring WebSocket connected for server %s", server_id)
+    connections = WEBSOCKET_CONNECTIONS.labels("monitoring")
+    send_seconds = WEBSOCKET_SEND_SECONDS.labels("monitoring")
+    frames = WEBSOCKET_FRAMES.labels("monitoring")
+    connections.inc()
     try:
         while True:
             try:
                 # Get comprehensive monitoring data
-                logger.debug(f"Fetching monitoring data for server {server_id}")
-                data = monitoring_service.get_monitoring_snapshot(server_id)
-                logger.debug(f"Sending monitoring data: {len(str(data))} bytes")
-                await websocket.send_json(data)
+                logger.debug("Fetching monitoring data for server %s", server_id)
+                payload = published_payload("monitoring")
+                if payload is None:
+                    payload = json.dumps(monitoring_service.get_monitoring_snapshot(server_id))
+                else:
+                    payload = payload.decode()
+                logger.debug("Sending monitoring data: %s bytes", len(payload))
+                start = time.perf_counter()
+                await websocket.send_text(payload)
+                send_seconds.observe(time.perf_counter() - start)
+                frames.inc()
                 await asyncio.sleep(2)  # Send every 2 seconds to reduce load
             except Exception as e:
-                logger.error(f"Error in monitoring loop: {e}", exc_info=True)
+                logger.error("Error in monitoring loop: %s", e, exc_info=True)
                 raise
     except WebSocketDisconnect:
-        logger.info(f"Monitoring WebSocket disconnected for server {server_id}")
+        logger.info("Monitoring WebSocket disconnected for server %s", server_id)
+    except Exception as e:
+        logger.error("Monitoring WebSocket error: %s", e, exc_info=True)
+        try:
+            await websocket.close()
+        except:
+            pass
+    finally:
+        connections.dec()
+        admission_controller.release(ticket)
+
+
+@router.websocket("/alerts")
+async def alerts_websocket(websocket: WebSocket, token: str = ""):
+    """WebSocket feed of alert state transitions (pending/firing/resolved)"""
+    await websocket.accept()
+    try:
+        verify_token(token, HTTPException(status_code=401))
+    except HTTPException:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    logger.info("Alerts WebSocket connected")
+    queue = alert_service.subscribe()
+    try:
+        # Current state first so a fresh dashboard doesn't wait for the next transition
+        await websocket.send_json({"type": "snapshot", "alerts": alert_service.active_alerts()})
+
+        async def watch_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        # Alerts can be rare, so watch the socket too or a closed client lingers until the next one
+        closed = asyncio.create_task(watch_disconnect())
+        try:
+            while not closed.done():
+                getter = asyncio.create_task(queue.get())
+                await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                await websocket.send_json({"type": "event", "alert": getter.result()})
+        finally:
+            closed.cancel()
+        logger.info("Alerts WebSocket disconnected")
+    except WebSocketDisconnect:
+        logger.info("Alerts WebSocket disconnected")
     except Exception as e:
-        logger.error(f"Monitoring WebSocket error: {e}", exc_info=True)
+        logger.error("Alerts WebSocket error: %s", e)
         try:
             await websocket.close()
         except:
             pass
+    finally:
+        alert_service.unsubscribe(queue)
+
+
+@router.websocket("/terminal/{server_id}")
+async def terminal_websocket(
+    websocket: WebSocket,
+    server_id: str,
+    token: str = "",
+    session_id: Optional[str] = None,
+    cols: int = 80,
+    rows: int = 24,
+):
+    """Interactive shell on a PTY.
+
+    Binary frames carry raw bytes both ways. Text frames are JSON control messages:
+    {"type": "input", "data": "..."}, {"type": "resize", "cols": c, "rows": r} and
+    {"type": "close"}. Pass session_id to reattach to a running session after a
+    disconnect; its recent output is replayed.
+    """
+    await websocket.accept()
+    try:
+        username = verify_token(token, HTTPException(status_code=401)).username
+    except HTTPException:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    if not settings.TERMINAL_ENABLED:
+        await websocket.close(code=1008, reason="Terminal sessions are disabled")
+        return
+    try:
+        if session_id:
+            session = terminal_service.get(session_id, username)
+        else:
+            session = terminal_service.create(username, cols, rows)
+    except TerminalError as e:
+        await websocket.close(code=1013, reason=str(e))
+        return
+
+    connections = WEBSOCKET_CONNECTIONS.labels("terminal")
+    frames = WEBSOCKET_FRAMES.labels("terminal")
+    connections.inc()
+    await websocket.send_json({"type": "session", "id": session.id})
+    queue = session.attach()
+
+    async def pump_output():
+        while True:
+            data = await queue.get()
+            if data is None:
+                break
+            await websocket.send_bytes(data)
+            frames.inc()
+            session.drained(queue)
+        # Shell exited (or another client took over the session)
+        await websocket.send_json({"type": "exit" if session.closed.is_set() else "detached"})
+        await websocket.close()
+
+    sender = asyncio.create_task(pump_output())
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            if message.get("bytes") is not None:
+                await session.write(message["bytes"])
+                continue
+            try:
+                control = json.loads(message.get("text") or "{}")
+                kind = control.get("type")
+                if kind == "input":
+                    await session.write(str(control.get("data", "")).encode())
+                elif kind == "resize":
+                    session.resize(int(control["cols"]), int(control["rows"]))
+                elif kind == "close":
+                    session.close()
+            except (ValueError, KeyError, TypeError, AttributeError, struct.error, OSError) as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        sender.cancel()
+        session.detach(queue)
+        connections.dec()
+        logger.info("Terminal websocket for session %s disconnected", session.id)
+
+
+@router.websocket("/logs")
+async def logs_websocket(
+    websocket: WebSocket,
+    token: str = "",
+    file: str = os.path.basename(settings.LOG_FILE),
+    filter: Optional[str] = None,
+    lines: int = 100,
+    rate: Optional[float] = None,
+):
+    """Follow an allowed log file.
+
+    Sends {"type": "lines", "lines": [...]} batches starting with the last `lines` lines,
+    {"type": "rotated"} / {"type": "truncated"} when the file is replaced or cut, and
+    {"type": "dropped", "count": n} when the filter-matched rate exceeds `rate` lines/s.
+    """
+    await websocket.accept()
+    try:
+        verify_token(token, HTTPException(status_code=401))
+    except HTTPException:
+        await websocket.close(code=1008, reason="Invalid token")
+        return
+    try:
+        path = log_follow_service.resolve(file)
+        pattern = log_follow_service.compile_filter(filter)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    if rate is None or not math.isfinite(rate):
+        rate = settings.LOG_FOLLOW_LINES_PER_SECOND
+    rate = min(max(rate, MIN_LINES_PER_SECOND), settings.LOG_FOLLOW_LINES_PER_SECOND)
+    subscriber = LogSubscriber(pattern, rate)
+    backlog = min(max(lines, 0), settings.LOG_FOLLOW_MAX_BACKLOG_LINES)
+    connections = WEBSOCKET_CONNECTIONS.labels("logs")
+    frames = WEBSOCKET_FRAMES.labels("logs")
+    connections.inc()
+    try:
+        initial = await log_follow_service.subscribe(path, subscriber, backlog)
+        await websocket.send_json({"type": "lines", "file": path, "lines": initial})
+
+        async def watch_disconnect():
+            while (await websocket.receive())["type"] != "websocket.disconnect":
+                pass
+
+        closed = asyncio.create_task(watch_disconnect())
+        try:
+            while not closed.done():
+                getter = asyncio.create_task(subscriber.queue.get())
+                await asyncio.wait({getter, closed}, return_when=asyncio.FIRST_COMPLETED)
+                if not getter.done():
+                    getter.cancel()
+                    break
+                await websocket.send_json(getter.result())
+                frames.inc()
+                dropped = subscriber.take_dropped()
+                if dropped:
+                    await websocket.send_json({"type": "dropped", "count": dropped})
+        finally:
+            closed.cancel()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        log_follow_service.unsubscribe(path, subscriber)
+        connections.dec()
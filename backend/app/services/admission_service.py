@@ -0,0 +1,226 @@
+import asyncio
+import logging
+import math
+import time
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from app.config import settings
+from app.instrumentation import ADMISSION_DECISIONS, ADMISSION_IN_FLIGHT, ADMISSION_QUEUED
+from app.models import AdmissionPolicy
+
+logger = logging.getLogger(__name__)
+
+# Idle per-user state is dropped once a route tracks more users than this
+MAX_IDLE_USERS = 1024
+
+
+class AdmissionRejected(Exception):
+    """Raised when a call cannot be admitted; maps to 429 (caller over its limits) or 503 (overloaded)"""
+
+    def __init__(self, status_code: int, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = max(1, math.ceil(retry_after))
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(burst, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Consume a token; returns 0 on success or the seconds until one is available"""
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take_up_to(self, count: int, now: float) -> int:
+        """Consume up to `count` tokens at once; returns how many were granted"""
+        self._refill(now)
+        granted = min(count, int(self.tokens))
+        self.tokens -= granted
+        return granted
+
+    def full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _UserState:
+    __slots__ = ("in_flight", "bucket")
+
+    def __init__(self, policy: AdmissionPolicy):
+        self.in_flight = 0
+        self.bucket = TokenBucket(policy.user_rate, policy.user_burst) if policy.user_rate else None
+
+
+class _RouteState:
+    def __init__(self, name: str, policy: AdmissionPolicy):
+        self.name = name
+        self.policy = policy
+        self.in_flight = 0
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.bucket = TokenBucket(policy.rate, policy.burst) if policy.rate else None
+        self.users: Dict[str, _UserState] = {}
+        self.admitted = 0
+        self.rejected: Counter = Counter()
+        # Moving average of how long a slot is held, used to estimate Retry-After
+        self.avg_hold = 0.0
+        self.in_flight_gauge = ADMISSION_IN_FLIGHT.labels(name)
+        self.queued_gauge = ADMISSION_QUEUED.labels(name)
+
+    def user(self, key: str) -> _UserState:
+        state = self.users.get(key)
+        if state is None:
+            if len(self.users) >= MAX_IDLE_USERS:
+                now = time.monotonic()
+                for idle in [k for k, u in self.users.items()
+                             if u.in_flight == 0 and (u.bucket is None or u.bucket.full(now))]:
+                    del self.users[idle]
+            state = self.users[key] = _UserState(self.policy)
+        return state
+
+    def reject(self, status_code: int, reason: str, retry_after: float) -> AdmissionRejected:
+        self.rejected[reason] += 1
+        ADMISSION_DECISIONS.labels(self.name, reason).inc()
+        return AdmissionRejected(status_code, reason, retry_after)
+
+    def queue_wait_estimate(self) -> float:
+        limit = max(self.policy.concurrency, 1)
+        return self.avg_hold * (len(self.waiters) + 1) / limit
+
+
+class AdmissionController:
+    """Per-route and per-user admission: token-bucket rates, concurrency caps and a bounded wait queue.
+
+    Checks run cheapest-first and fail fast. A caller over its own rate or concurrency
+    share gets 429; when the route itself is saturated callers queue FIFO, and a full
+    queue or a queue timeout gives 503. Retry-After is derived from the bucket refill
+    time or the observed slot hold time.
+    """
+
+    def __init__(self):
+        self.routes: Dict[str, _RouteState] = {}
+        self.configure(settings.ADMISSION_POLICIES)
+
+    def configure(self, policies: Dict[str, Dict[str, float]]) -> None:
+        for name, fields in policies.items():
+            self.routes[name] = _RouteState(name, AdmissionPolicy(**fields))
+
+    async def acquire(self, route: str, user: str) -> Optional[Tuple[_RouteState, _UserState, float]]:
+        """Admit a call or raise AdmissionRejected; pass the returned ticket to release()"""
+        state = self.routes.get(route)
+        if state is None or not settings.ADMISSION_ENABLED:
+            return None
+        policy = state.policy
+        now = time.monotonic()
+        user_state = state.user(user)
+
+        if policy.user_concurrency and user_state.in_flight >= policy.user_concurrency:
+            raise state.reject(429, "user_concurrency", state.avg_hold)
+        if user_state.bucket is not None:
+            wait = user_state.bucket.take(now)
+            if wait:
+                raise state.reject(429, "user_rate", wait)
+        if state.bucket is not None:
+            wait = state.bucket.take(now)
+            if wait:
+                raise state.reject(429, "rate", wait)
+
+        user_state.in_flight += 1
+        try:
+            if policy.concurrency and (state.in_flight >= policy.concurrency or state.waiters):
+                await self._wait_for_slot(state)
+            else:
+                state.in_flight += 1
+        except BaseException:
+            user_state.in_flight -= 1
+            raise
+
+        state.admitted += 1
+        ADMISSION_DECISIONS.labels(route, "admitted").inc()
+        state.in_flight_gauge.set(state.in_flight)
+        return state, user_state, time.monotonic()
+
+    async def _wait_for_slot(self, state: _RouteState) -> None:
+        if len(state.waiters) >= state.policy.queue:
+            raise state.reject(503, "queue_full", state.queue_wait_estimate())
+        waiter = asyncio.get_running_loop().create_future()
+        state.waiters.append(waiter)
+        state.queued_gauge.set(len(state.waiters))
+        try:
+            # release() hands its slot straight to the waiter, so in_flight is unchanged
+            await asyncio.wait_for(asyncio.shield(waiter), state.policy.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                return  # Slot arrived just as the timeout fired
+            waiter.cancel()
+            raise state.reject(503, "queue_timeout", state.queue_wait_estimate())
+        except asyncio.CancelledError:
+            # Caller went away: give back a slot we may already have been handed
+            if waiter.done() and not waiter.cancelled():
+                self._release_slot(state)
+            waiter.cancel()
+            raise
+        finally:
+            if waiter in state.waiters:
+                state.waiters.remove(waiter)
+            state.queued_gauge.set(len(state.waiters))
+
+    def release(self, ticket: Optional[Tuple[_RouteState, _UserState, float]]) -> None:
+        if ticket is None:
+            return
+        state, user_state, started = ticket
+        user_state.in_flight -= 1
+        state.avg_hold = 0.8 * state.avg_hold + 0.2 * (time.monotonic() - started)
+        self._release_slot(state)
+        state.in_flight_gauge.set(state.in_flight)
+
+    def _release_slot(self, state: _RouteState) -> None:
+        while state.waiters:
+            waiter = state.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                state.queued_gauge.set(len(state.waiters))
+                return
+        state.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, route: str, user: str):
+        """Hold an admission slot for the duration of a block, e.g. a websocket connection"""
+        ticket = await self.acquire(route, user)
+        try:
+            yield
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.ADMISSION_ENABLED,
+            "routes": {
+                name: {
+                    "in_flight": state.in_flight,
+                    "queued": len(state.waiters),
+                    "admitted": state.admitted,
+                    "rejected": dict(state.rejected),
+                    "avg_hold_ms": round(state.avg_hold * 1000, 1),
+                    "users": len(state.users),
+                    "policy": state.policy.model_dump(),
+                }
+                for name, state in self.routes.items()
+            },
+        }
+
+
+admission_controller = AdmissionController()
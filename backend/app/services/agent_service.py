@@ -2,9 +2,12 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import tool
 from app.config import settings
+from app.instrumentation import AGENT_CHAT_SECONDS, AGENT_LLM_SECONDS, AGENT_TOOL_CALLS
+from app.services.output_capture import run_command
 import logging
 import os
 import subprocess
+import time
 from pathlib import Path
 from datetime import datetime
 
@@ -159,19 +162,33 @@ def execute_system_command(command: str) -> str:
         Command output
     """
     try:
-        result = subprocess.run(
+        # Small previews keep large outputs out of the model context; the full output
+        # stays retrievable through the commands output endpoint
+        result = run_command(
             command,
-            shell=True,
-            capture_output=True,
-            text=True,
-            timeout=30
+            30,
+            head_bytes=settings.AGENT_COMMAND_OUTPUT_HEAD_BYTES,
+            tail_bytes=settings.AGENT_COMMAND_OUTPUT_TAIL_BYTES,
         )
-        return result.stdout or result.stderr or "Command executed successfully"
+        output = result.stdout.preview() or result.stderr.preview() or "Command executed successfully"
+        if result.truncated:
+            output += f"\n[Output truncated; full output saved as {result.output_id}]"
+        return output
     except subprocess.TimeoutExpired:
         return "Error: Command timed out"
     except Exception as e:
         return f"Error executing command: {str(e)}"
 
+# Every tool the agent can call, in the order they are bound to the LLM
+AGENT_TOOLS = [
+    list_files,
+    change_directory,
+    show_file_details,
+    get_current_directory,
+    search_files,
+    execute_system_command,
+]
+
 class AgentService:
     def __init__(self):
         self.llm = None
@@ -191,24 +208,23 @@ class AgentService:
                 temperature=0.3
             )
             
-            # Define all tools
-            self.tools = [
-                list_files,
-                change_directory,
-                show_file_details,
-                get_current_directory,
-                search_files,
-                execute_system_command
-            ]
+            self.tools = list(AGENT_TOOLS)
             
             # Bind tools to LLM
             self.llm_with_tools = self.llm.bind_tools(self.tools)
             
             logger.info("Agent initialized successfully with file system tools")
         except Exception as e:
-            logger.error(f"Failed to initialize agent: {e}")
+            logger.error("Failed to initialize agent: %s", e)
 
     async def chat(self, message: str, server_id: str):
+        start = time.perf_counter()
+        try:
+            return await self._chat(message, server_id)
+        finally:
+            AGENT_CHAT_SECONDS.observe(time.perf_counter() - start)
+
+    async def _chat(self, message: str, server_id: str):
         if not self.llm:
             return "Agent not initialized. Please ensure GEMINI_API_KEY is set in your .env file."
         
@@ -234,7 +250,9 @@ If a user asks to do something unsafe, politely explain why you can't do it."""
             ]
             
             # Invoke LLM with tools
+            llm_start = time.perf_counter()
             response = await self.llm_with_tools.ainvoke(messages)
+            AGENT_LLM_SECONDS.observe(time.perf_counter() - llm_start)
             
             # Check if tools were called
             if hasattr(response, 'tool_calls') and response.tool_calls:
@@ -247,6 +265,7 @@ If a user asks to do something unsafe, politely explain why you can't do it."""
                     # Find and execute the tool
                     for tool_func in self.tools:
                         if tool_func.name == tool_name:
+                            AGENT_TOOL_CALLS.labels(tool_name).inc()
                             result = tool_func.invoke(tool_args)
                             tool_results.append(f"Tool '{tool_name}' result:\n{result}")
                             break
@@ -259,7 +278,7 @@ If a user asks to do something unsafe, politely explain why you can't do it."""
             return response.content if hasattr(response, 'content') else str(response)
             
         except Exception as e:
-            logger.error(f"Error during chat: {e}")
+            logger.error("Error during chat: %s", e)
             return f"I encountered an error: {str(e)}"
 
 agent_service = AgentService()
@@ -0,0 +1,458 @@
+import asyncio
+import json
+import logging
+import operator
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, FrozenSet, List, Optional, Set, Tuple
+
+import psutil
+
+from app.config import settings
+from app.models import AlertRule
+from app.services.metrics_service import metrics_service
+from app.services.snapshot_plane import fcntl, published_snapshot
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {">": operator.gt, ">=": operator.ge, "<": operator.lt, "<=": operator.le}
+
+DEFAULT_RULES = [
+    AlertRule(id="high-cpu", name="CPU above 90% for 5m", metric="cpu_usage", aggregation="avg",
+              operator=">", threshold=90, window_seconds=300, severity="critical"),
+    AlertRule(id="high-memory", name="Memory above 90% for 5m", metric="memory_usage", aggregation="avg",
+              operator=">", threshold=90, window_seconds=300, severity="warning"),
+    AlertRule(id="low-disk", name="Less than 10GB disk free", metric="free_disk_gb",
+              operator="<", threshold=10, severity="critical"),
+]
+
+
+class RollingWindow:
+    """Time-based sliding window with O(1) amortised add/evict and O(1) avg/min/max.
+
+    Keeps a running sum for the mean and monotonic deques for min and max, so an
+    aggregate never rescans the window. `since` is when the current unbroken run of
+    samples began; until it is a full span old the window is not covered.
+    """
+
+    __slots__ = ("span", "samples", "total", "mins", "maxs", "since")
+
+    def __init__(self, span: float):
+        self.span = span
+        self.samples: deque = deque()
+        self.total = 0.0
+        self.mins: deque = deque()
+        self.maxs: deque = deque()
+        self.since = 0.0
+
+    def add(self, timestamp: float, value: float) -> None:
+        if not self.samples or timestamp - self.samples[-1][0] > self.span:
+            self.since = timestamp  # First sample, or a gap longer than the window
+        self.samples.append((timestamp, value))
+        self.total += value
+        while self.mins and self.mins[-1][1] > value:
+            self.mins.pop()
+        self.mins.append((timestamp, value))
+        while self.maxs and self.maxs[-1][1] < value:
+            self.maxs.pop()
+        self.maxs.append((timestamp, value))
+        self.evict(timestamp)
+
+    def evict(self, now: float) -> None:
+        cutoff = now - self.span
+        samples = self.samples
+        # Always keep the newest sample so a zero-width window behaves like "last"
+        while len(samples) > 1 and samples[0][0] < cutoff:
+            _, value = samples.popleft()
+            self.total -= value
+        oldest = samples[0][0] if samples else now
+        while self.mins and self.mins[0][0] < oldest:
+            self.mins.popleft()
+        while self.maxs and self.maxs[0][0] < oldest:
+            self.maxs.popleft()
+
+    def covers(self, now: float) -> bool:
+        return now - self.since >= self.span
+
+    def aggregate(self, kind: str) -> Optional[float]:
+        if not self.samples:
+            return None
+        if kind == "avg":
+            return self.total / len(self.samples)
+        if kind == "min":
+            return self.mins[0][1]
+        if kind == "max":
+            return self.maxs[0][1]
+        return self.samples[-1][1]
+
+
+class AlertState:
+    __slots__ = ("state", "since", "value", "fired_at")
+
+    def __init__(self):
+        self.state = "inactive"
+        self.since = 0.0
+        self.value: Optional[float] = None
+        self.fired_at: Optional[float] = None
+
+
+class AlertEngine:
+    """Evaluates rules incrementally against each new sample.
+
+    Rules are indexed by metric and rolling windows are shared between all rules that
+    use the same (server, metric, window span), so a sample costs one window update per
+    distinct span plus one comparison per rule. State per (rule, server) moves through
+    inactive -> pending -> firing -> resolved; only transitions produce events, which
+    deduplicates notifications for alerts that stay firing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rules: Dict[str, AlertRule] = {}
+        self._rules_by_metric: Dict[str, List[AlertRule]] = {}
+        self._process_rules: List[AlertRule] = []
+        self._spans_by_metric: Dict[str, Set[float]] = {}
+        self._windows: Dict[Tuple[str, str, float], RollingWindow] = {}
+        self._states: Dict[Tuple[str, str], AlertState] = {}
+
+    def add_rule(self, rule: AlertRule) -> AlertRule:
+        if rule.kind == "threshold" and not rule.metric:
+            raise ValueError("Threshold rules require a metric")
+        if rule.kind == "process_absent" and not rule.process_name:
+            raise ValueError("process_absent rules require a process_name")
+        if not rule.id:
+            rule = rule.model_copy(update={"id": uuid.uuid4().hex[:12]})
+        with self._lock:
+            self.rules[rule.id] = rule
+            self._reindex()
+        return rule
+
+    def remove_rule(self, rule_id: str) -> bool:
+        with self._lock:
+            if self.rules.pop(rule_id, None) is None:
+                return False
+            for key in [key for key in self._states if key[0] == rule_id]:
+                del self._states[key]
+            self._reindex()
+            return True
+
+    def replace_rules(self, rules: List[AlertRule]) -> None:
+        """Swap in a whole rule set, keeping the state of rules that are still present"""
+        with self._lock:
+            self.rules = {rule.id: rule for rule in rules}
+            for key in [key for key in self._states if key[0] not in self.rules]:
+                del self._states[key]
+            self._reindex()
+
+    def _reindex(self) -> None:
+        by_metric: Dict[str, List[AlertRule]] = {}
+        spans: Dict[str, Set[float]] = {}
+        process_rules = []
+        for rule in self.rules.values():
+            if rule.kind == "process_absent":
+                process_rules.append(rule)
+                continue
+            by_metric.setdefault(rule.metric, []).append(rule)
+            spans.setdefault(rule.metric, set()).add(rule.window_seconds)
+        self._rules_by_metric = by_metric
+        self._spans_by_metric = spans
+        self._process_rules = process_rules
+        # Drop windows no rule needs any more
+        self._windows = {
+            key: window for key, window in self._windows.items()
+            if key[2] in spans.get(key[1], ())
+        }
+
+    @property
+    def needs_process_names(self) -> bool:
+        return bool(self._process_rules)
+
+    def evaluate(self, server_id: str, sample: Dict[str, Any], timestamp: float,
+                 process_names: Optional[FrozenSet[str]] = None) -> List[Dict[str, Any]]:
+        """Feed one sample and return the state transitions it caused"""
+        events: List[Dict[str, Any]] = []
+        with self._lock:
+            for metric, rules in self._rules_by_metric.items():
+                value = sample.get(metric)
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    continue
+                for span in self._spans_by_metric[metric]:
+                    key = (server_id, metric, span)
+                    window = self._windows.get(key)
+                    if window is None:
+                        window = self._windows[key] = RollingWindow(span)
+                    window.add(timestamp, float(value))
+                for rule in rules:
+                    if rule.server_id not in ("*", server_id):
+                        continue
+                    window = self._windows[(server_id, metric, rule.window_seconds)]
+                    # "avg over 5m" means nothing until 5 minutes of samples exist
+                    if rule.aggregation == "last" or window.covers(timestamp):
+                        current = window.aggregate(rule.aggregation)
+                    else:
+                        current = None
+                    active = current is not None and OPERATORS[rule.operator](current, rule.threshold)
+                    self._transition(rule, server_id, active, current, timestamp, events)
+
+            if process_names is not None:
+                for rule in self._process_rules:
+                    if rule.server_id not in ("*", server_id):
+                        continue
+                    active = rule.process_name not in process_names
+                    self._transition(rule, server_id, active, None, timestamp, events)
+        return events
+
+    def _transition(self, rule: AlertRule, server_id: str, active: bool, value: Optional[float],
+                    now: float, events: List[Dict[str, Any]]) -> None:
+        key = (rule.id, server_id)
+        state = self._states.get(key)
+        if state is None:
+            if not active:
+                return
+            state = self._states[key] = AlertState()
+        state.value = value
+
+        previous = state.state
+        if active:
+            if previous in ("inactive", "resolved"):
+                state.state, state.since = "pending", now
+            if state.state == "pending" and now - state.since >= rule.for_seconds:
+                state.state, state.fired_at = "firing", now
+        elif previous in ("pending", "firing"):
+            state.state, state.since = ("resolved" if previous == "firing" else "inactive"), now
+
+        if state.state != previous:
+            events.append(self._event(rule, server_id, state, now))
+        if state.state in ("inactive", "resolved"):
+            # Resolved alerts are reported once, then forgotten until they trigger again
+            del self._states[key]
+
+    @staticmethod
+    def _event(rule: AlertRule, server_id: str, state: AlertState, now: float) -> Dict[str, Any]:
+        return {
+            "rule_id": rule.id,
+            "rule_name": rule.name,
+            "server_id": server_id,
+            "severity": rule.severity,
+            "state": state.state,
+            "value": round(state.value, 3) if state.value is not None else None,
+            "threshold": rule.threshold if rule.kind == "threshold" else None,
+            "since": state.since,
+            "fired_at": state.fired_at,
+            "timestamp": now,
+        }
+
+    def active_alerts(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                self._event(self.rules[rule_id], server_id, state, state.since)
+                for (rule_id, server_id), state in self._states.items()
+                if state.state in ("pending", "firing")
+            ]
+
+
+class AlertService:
+    """Owns the rule engine, feeds it samples and fans transitions out to subscribers.
+
+    With the snapshot plane (shared=True) only the collector process evaluates, so
+    each transition happens once per host. Rules then live in ALERT_RULES_FILE, which
+    workers edit and the collector reloads, and workers serve alert state and relay
+    transitions from the plane's "alerts" channel.
+    """
+
+    def __init__(self):
+        self.engine = AlertEngine()
+        for rule in DEFAULT_RULES:
+            self.engine.add_rule(rule)
+        self.recent_events: deque = deque(maxlen=200)
+        self.event_count = 0
+        self.shared = False
+        self._events_lock = threading.Lock()
+        self._rules_version: Optional[Tuple[int, int, int]] = None
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        metrics_service.add_listener(self.on_sample)
+
+    def start(self, shared: bool = False) -> None:
+        self.shared = shared
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._task = self._loop.create_task(self._follow_loop() if shared else self._sample_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop(self) -> None:
+        """Keep rules evaluated even when no dashboard is polling"""
+        interval = settings.ALERT_EVAL_INTERVAL_SECONDS
+        while True:
+            try:
+                for server_id in settings.ALERT_SERVER_IDS:
+                    latest = metrics_service.latest.get(server_id)
+                    if latest is None or time.time() - latest[0] >= interval:
+                        # get_snapshot triggers on_sample through the listener hook
+                        await asyncio.to_thread(metrics_service.get_snapshot, server_id)
+                    if self.engine.needs_process_names:
+                        names = await asyncio.to_thread(self._process_names)
+                        self.evaluate_processes(server_id, names)
+            except Exception as e:
+                logger.error("Alert sampling failed: %s", e, exc_info=True)
+            await asyncio.sleep(interval)
+
+    async def _follow_loop(self) -> None:
+        """Relay transitions evaluated by the collector to this worker's subscribers"""
+        seen: Optional[int] = None
+        while True:
+            try:
+                published = published_snapshot("alerts")
+                if published is not None:
+                    state = published[1]
+                    count = state["event_count"]
+                    if seen is not None and count > seen:
+                        self._notify(state["events"][-min(count - seen, len(state["events"])):])
+                    seen = count  # Also resyncs after a collector restart
+            except Exception as e:
+                logger.error("Alert follow failed: %s", e, exc_info=True)
+            await asyncio.sleep(1.0)
+
+    @staticmethod
+    def _process_names() -> FrozenSet[str]:
+        names = set()
+        for proc in psutil.process_iter(['name']):
+            name = proc.info.get('name')
+            if name:
+                names.add(name)
+        return frozenset(names)
+
+    def on_sample(self, server_id: str, snapshot: Dict[str, Any], timestamp: float) -> None:
+        if self.shared:
+            return  # The collector evaluates
+        self._publish(self.engine.evaluate(server_id, snapshot, timestamp))
+
+    def evaluate_processes(self, server_id: str, names: FrozenSet[str]) -> None:
+        self._publish(self.engine.evaluate(server_id, {}, time.time(), names))
+
+    def _publish(self, events: List[Dict[str, Any]]) -> None:
+        if not events:
+            return
+        for event in events:
+            logger.warning("Alert %s [%s] on server %s: %s", event["state"], event["severity"],
+                           event["server_id"], event["rule_name"])
+        if self._loop is None:
+            self._record(events)
+            return
+        # Samples may be taken on worker threads; hand the fan-out to the event loop
+        self._loop.call_soon_threadsafe(self._fan_out, events)
+
+    def _record(self, events: List[Dict[str, Any]]) -> None:
+        with self._events_lock:
+            self.recent_events.extend(events)
+            self.event_count += len(events)
+
+    def _fan_out(self, events: List[Dict[str, Any]]) -> None:
+        self._record(events)
+        self._notify(events)
+
+    def _notify(self, events: List[Dict[str, Any]]) -> None:
+        for queue in self._subscribers:
+            for event in events:
+                if queue.full():
+                    queue.get_nowait()  # Slow consumer: drop its oldest event
+                queue.put_nowait(event)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=100)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._subscribers.discard(queue)
+
+    def active_alerts(self) -> List[Dict[str, Any]]:
+        if self.shared:
+            published = published_snapshot("alerts")
+            return published[1]["active"] if published else []
+        return self.engine.active_alerts()
+
+    def events(self) -> List[Dict[str, Any]]:
+        if self.shared:
+            published = published_snapshot("alerts")
+            return published[1]["events"] if published else []
+        with self._events_lock:
+            return list(self.recent_events)
+
+    def published_state(self) -> Dict[str, Any]:
+        """What the collector publishes on the "alerts" channel"""
+        with self._events_lock:
+            return {
+                "active": self.engine.active_alerts(),
+                "events": list(self.recent_events),
+                "event_count": self.event_count,
+            }
+
+    def list_rules(self) -> List[AlertRule]:
+        if self.shared:
+            self.load_rules()
+        return list(self.engine.rules.values())
+
+    def add_rule(self, rule: AlertRule) -> AlertRule:
+        if not self.shared:
+            return self.engine.add_rule(rule)
+        with self._rules_file_lock():
+            self.load_rules()
+            rule = self.engine.add_rule(rule)
+            self._save_rules()
+        return rule
+
+    def remove_rule(self, rule_id: str) -> bool:
+        if not self.shared:
+            return self.engine.remove_rule(rule_id)
+        with self._rules_file_lock():
+            self.load_rules()
+            removed = self.engine.remove_rule(rule_id)
+            if removed:
+                self._save_rules()
+        return removed
+
+    def load_rules(self) -> None:
+        """Reload ALERT_RULES_FILE if it changed; until someone edits a rule the defaults apply"""
+        try:
+            stat = os.stat(settings.ALERT_RULES_FILE)
+        except FileNotFoundError:
+            return
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version == self._rules_version:
+            return
+        with open(settings.ALERT_RULES_FILE) as f:
+            rules = [AlertRule(**fields) for fields in json.load(f)]
+        self.engine.replace_rules(rules)
+        self._rules_version = version
+
+    def _save_rules(self) -> None:
+        path = settings.ALERT_RULES_FILE
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            json.dump([rule.model_dump() for rule in self.engine.rules.values()], f, indent=2)
+        os.replace(temp, path)  # Readers never see a partial file
+        stat = os.stat(path)
+        self._rules_version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    @contextmanager
+    def _rules_file_lock(self):
+        # Serialises read-modify-write of the rules file across workers
+        with open(f"{settings.ALERT_RULES_FILE}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+alert_service = AlertService()
@@ -0,0 +1,183 @@
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import Counter, deque
+from typing import Any, Dict, Optional
+from app.config import settings
+from app.instrumentation import registry
+
+logger = logging.getLogger(__name__)
+
+EVENT_LOOP_STALLS = registry.counter(
+    "gauntlet_event_loop_stalls", "Event loop stalls longer than the watchdog threshold")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+def _collapse(frame) -> str:
+    """Render a frame chain root-first as 'a;b;c' (collapsed-stack format)"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+class StallWatchdog:
+    """Detects event loop stalls and captures the blocking stack.
+
+    A coroutine on the loop refreshes a heartbeat; a daemon thread checks the heartbeat
+    and, when it is older than the threshold, snapshots the loop thread's current stack.
+    The only steady-state cost is one short sleep on each side per interval.
+    """
+
+    def __init__(self, threshold: float, interval: float = 0.05, history: int = 50):
+        self.threshold = threshold
+        self.interval = interval
+        self.stalls: deque = deque(maxlen=history)
+        self.stall_count = 0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._current: Optional[Dict[str, Any]] = None
+
+    def start(self) -> None:
+        if self._task is not None:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="stall-watchdog", daemon=True)
+        self._thread.start()
+
+    async def stop(self) -> None:
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _heartbeat(self) -> None:
+        while True:
+            self._last_beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.interval):
+            lag = time.monotonic() - self._last_beat
+            if lag > self.threshold + self.interval:
+                if self._current is None:
+                    self._begin_stall(lag)
+                else:
+                    self._current["duration_ms"] = round(lag * 1000, 1)
+            elif self._current is not None:
+                self._end_stall()
+
+    def _begin_stall(self, lag: float) -> None:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame) if frame is not None else []
+        self._current = {
+            "started_at": time.time() - lag,
+            "duration_ms": round(lag * 1000, 1),
+            "ongoing": True,
+            "stack": [line.rstrip() for line in stack],
+        }
+        self.stalls.append(self._current)
+        self.stall_count += 1
+        EVENT_LOOP_STALLS.inc()
+        where = stack[-1].strip().splitlines()[0] if stack else "unknown"
+        logger.warning("Event loop stalled for over %.0fms at %s", lag * 1000, where)
+
+    def _end_stall(self) -> None:
+        self._current["ongoing"] = False
+        logger.warning("Event loop stall ended after %sms", self._current["duration_ms"])
+        self._current = None
+
+    def get_stalls(self) -> Dict[str, Any]:
+        return {
+            "threshold_ms": round(self.threshold * 1000, 1),
+            "running": self._task is not None,
+            "total": self.stall_count,
+            "recent": list(self.stalls),
+        }
+
+
+class SamplingProfiler:
+    """Time-boxed statistical profiler over all threads of the running process.
+
+    Samples sys._current_frames() from a background thread, so the profiled code is
+    never instrumented or traced. Only one profile may run at a time.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self._lock.locked()
+
+    def profile(self, duration: float, interval: float, thread_filter: Optional[int] = None) -> Dict[str, Any]:
+        """Sample stacks for `duration` seconds; returns collapsed stacks and sample counts"""
+        if not self._lock.acquire(blocking=False):
+            raise RuntimeError("A profile is already running")
+        try:
+            duration = min(max(duration, 0.1), self.max_seconds)
+            interval = max(interval, 0.001)
+            own_id = threading.get_ident()
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: Counter = Counter()
+            samples = 0
+            deadline = time.monotonic() + duration
+            while time.monotonic() < deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id == own_id or (thread_filter is not None and thread_id != thread_filter):
+                        continue
+                    name = thread_names.get(thread_id, str(thread_id))
+                    stacks[f"{name};{_collapse(frame)}"] += 1
+                samples += 1
+                time.sleep(interval)
+            return {"duration": duration, "interval": interval, "samples": samples, "stacks": stacks}
+        finally:
+            self._lock.release()
+
+    @staticmethod
+    def to_collapsed(stacks: Counter) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+class DiagnosticsService:
+    def __init__(self):
+        self.watchdog = StallWatchdog(threshold=settings.DIAGNOSTICS_STALL_THRESHOLD_MS / 1000)
+        self.profiler = SamplingProfiler(max_seconds=settings.DIAGNOSTICS_PROFILE_MAX_SECONDS)
+
+    def start(self) -> None:
+        if settings.DIAGNOSTICS_WATCHDOG_ENABLED:
+            self.watchdog.start()
+
+    async def stop(self) -> None:
+        await self.watchdog.stop()
+
+    async def run_profile(self, duration: float, interval: float, loop_only: bool = False) -> Dict[str, Any]:
+        """Run the profiler in a worker thread so the event loop keeps serving requests"""
+        thread_filter = threading.get_ident() if loop_only else None
+        return await asyncio.to_thread(self.profiler.profile, duration, interval, thread_filter)
+
+    def get_stalls(self) -> Dict[str, Any]:
+        return self.watchdog.get_stalls()
+
+diagnostics_service = DiagnosticsService()
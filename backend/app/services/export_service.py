@@ -0,0 +1,296 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sys
+import threading
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Iterator, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# NDJSON lines are batched into chunks of about this size before crossing to the event loop
+CHUNK_BYTES = 64 * 1024
+# Chunks the scanning thread may run ahead of the client before it waits
+MAX_PENDING_CHUNKS = 8
+
+KIND_FILES = {
+    "inet": ("tcp", "tcp6", "udp", "udp6"),
+    "inet4": ("tcp", "udp"),
+    "inet6": ("tcp6", "udp6"),
+    "tcp": ("tcp", "tcp6"),
+    "tcp4": ("tcp",),
+    "tcp6": ("tcp6",),
+    "udp": ("udp", "udp6"),
+    "udp4": ("udp",),
+    "udp6": ("udp6",),
+}
+
+# /proc/net/tcp state codes, named as psutil names them
+TCP_STATES = {
+    "01": "ESTABLISHED", "02": "SYN_SENT", "03": "SYN_RECV", "04": "FIN_WAIT1",
+    "05": "FIN_WAIT2", "06": "TIME_WAIT", "07": "CLOSE", "08": "CLOSE_WAIT",
+    "09": "LAST_ACK", "0A": "LISTEN", "0B": "CLOSING", "0C": "SYN_RECV",
+}
+
+PROCESS_FILTER_ATTRS = ['pid', 'name', 'username', 'status']
+PROCESS_DETAIL_ATTRS = ['ppid', 'create_time', 'cpu_percent', 'memory_percent', 'memory_info', 'num_threads']
+
+
+class _Stopped(Exception):
+    pass
+
+
+def iter_processes(
+    name: Optional[str] = None,
+    username: Optional[str] = None,
+    status: Optional[str] = None,
+    min_cpu: float = 0.0,
+    min_memory: float = 0.0,
+    cmdline: bool = False,
+) -> Iterator[Dict[str, Any]]:
+    """Every process as a dict, filtered while iterating.
+
+    Only the cheap attributes are read for the name/username/status filters; the
+    rest (and the optional, expensive cmdline) are read for matching processes only.
+    """
+    name = name.lower() if name else None
+    attrs = PROCESS_DETAIL_ATTRS + (['cmdline'] if cmdline else [])
+    for proc in psutil.process_iter(PROCESS_FILTER_ATTRS):
+        info = proc.info
+        if name and name not in (info.get('name') or '').lower():
+            continue
+        if username and info.get('username') != username:
+            continue
+        if status and info.get('status') != status:
+            continue
+        try:
+            detail = proc.as_dict(attrs, ad_value=None)
+        except psutil.NoSuchProcess:
+            continue
+        cpu = round(detail.get('cpu_percent') or 0.0, 2)
+        memory = round(detail.get('memory_percent') or 0.0, 2)
+        if cpu < min_cpu or memory < min_memory:
+            continue
+        memory_info = detail.get('memory_info')
+        row = {
+            "pid": info['pid'],
+            "ppid": detail.get('ppid'),
+            "name": info.get('name') or 'Unknown',
+            "username": info.get('username') or 'N/A',
+            "status": info.get('status', 'unknown'),
+            "create_time": detail.get('create_time'),
+            "cpu": cpu,
+            "memory": memory,
+            "rss": memory_info.rss if memory_info else None,
+            "threads": detail.get('num_threads'),
+        }
+        if cmdline:
+            row["cmdline"] = " ".join(detail.get('cmdline') or [])
+        yield row
+
+
+def _decode_address(value: str) -> Optional[str]:
+    ip_hex, port_hex = value.split(":")
+    port = int(port_hex, 16)
+    # The kernel prints each 32-bit word of the address as a host-order integer, so
+    # packing the words back in native order restores the network-order bytes
+    packed = b"".join(int(ip_hex[i:i + 8], 16).to_bytes(4, sys.byteorder) for i in range(0, len(ip_hex), 8))
+    if not port and not any(packed):
+        return None
+    family = socket.AF_INET if len(packed) == 4 else socket.AF_INET6
+    return f"{socket.inet_ntop(family, packed)}:{port}"
+
+
+def _socket_inodes(pid: int) -> Iterator[int]:
+    """Inodes of the sockets held by `pid`"""
+    fd_dir = f"/proc/{pid}/fd"
+    try:
+        fds = os.listdir(fd_dir)
+    except OSError:
+        return
+    for fd in fds:
+        try:
+            target = os.readlink(f"{fd_dir}/{fd}")
+        except OSError:
+            continue
+        if target.startswith("socket:["):
+            yield int(target[8:-1])
+
+
+class _SocketOwners:
+    """Finds the pid holding a socket inode, scanning /proc/<pid>/fd only as far as needed.
+
+    Sockets met on the way are remembered until their own row asks for them, so the map
+    holds only sockets already scanned but not yet streamed. Rows that are filtered out
+    never ask, and a scan that has covered every process answers the rest with 0.
+    """
+
+    def __init__(self, pids: Iterable[int]):
+        self._pids = iter(pids)
+        self._pending: Dict[int, int] = {}
+
+    def owner(self, inode: int) -> int:
+        if not inode:
+            return 0  # TIME_WAIT and similar sockets have no inode and no owner
+        pid = self._pending.pop(inode, None)
+        if pid is not None:
+            return pid
+        for pid in self._pids:
+            found = False
+            for held in _socket_inodes(pid):
+                if held == inode:
+                    found = True
+                else:
+                    self._pending[held] = pid
+            if found:
+                return pid
+        return 0
+
+
+def _iter_proc_net(
+    kind: str,
+    owner_pid: Optional[int],
+    matches: Callable[[Dict[str, Any]], bool],
+) -> Iterator[Dict[str, Any]]:
+    # With a pid filter only that process' fds need resolving
+    if owner_pid is not None:
+        held = set(_socket_inodes(owner_pid))
+    else:
+        owners = _SocketOwners(psutil.pids())
+    for table in KIND_FILES[kind]:
+        try:
+            f = open(f"/proc/net/{table}")
+        except OSError:
+            continue
+        with f:
+            next(f, None)  # Header
+            for line in f:
+                fields = line.split()
+                if len(fields) < 10:
+                    continue
+                inode = int(fields[9])
+                if owner_pid is not None and inode not in held:
+                    continue
+                row = {
+                    "type": "tcp" if table.startswith("tcp") else "udp",
+                    "family": "ipv6" if table.endswith("6") else "ipv4",
+                    "local_address": _decode_address(fields[1]) or "N/A",
+                    "remote_address": _decode_address(fields[2]) or "N/A",
+                    "status": TCP_STATES.get(fields[3], "NONE") if table.startswith("tcp") else "NONE",
+                }
+                # Owners are looked up last, and only for rows that pass the other filters
+                if not matches(row):
+                    continue
+                row["pid"] = owner_pid if owner_pid is not None else owners.owner(inode)
+                yield row
+
+
+def _iter_psutil(
+    kind: str,
+    owner_pid: Optional[int],
+    matches: Callable[[Dict[str, Any]], bool],
+) -> Iterator[Dict[str, Any]]:
+    for conn in psutil.net_connections(kind=kind):
+        if owner_pid is not None and conn.pid != owner_pid:
+            continue
+        row = {
+            "type": "tcp" if conn.type == socket.SOCK_STREAM else "udp",
+            "family": "ipv6" if conn.family == socket.AF_INET6 else "ipv4",
+            "local_address": f"{conn.laddr.ip}:{conn.laddr.port}" if conn.laddr else "N/A",
+            "remote_address": f"{conn.raddr.ip}:{conn.raddr.port}" if conn.raddr else "N/A",
+            "status": conn.status,
+            "pid": conn.pid or 0,
+        }
+        if matches(row):
+            yield row
+
+
+def iter_connections(
+    kind: str = "inet",
+    status: Optional[str] = None,
+    pid: Optional[int] = None,
+    port: Optional[int] = None,
+    remote_ip: Optional[str] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Every socket as a dict, filtered while iterating.
+
+    On Linux the /proc/net tables are read line by line and socket owners are found
+    lazily, so memory is bounded by the sockets scanned ahead of the stream rather than
+    by the whole table; elsewhere psutil builds the table first.
+    """
+    if kind not in KIND_FILES:
+        raise ValueError(f"Unknown connection kind: {kind}")
+    suffix = f":{port}" if port is not None else None
+
+    def matches(row: Dict[str, Any]) -> bool:
+        if status and row["status"] != status:
+            return False
+        if suffix and not (row["local_address"].endswith(suffix) or row["remote_address"].endswith(suffix)):
+            return False
+        return not remote_ip or row["remote_address"].startswith(remote_ip)
+
+    if sys.platform.startswith("linux"):
+        return _iter_proc_net(kind, pid, matches)
+    return _iter_psutil(kind, pid, matches)
+
+
+async def stream_ndjson(rows_factory: Callable[[], Iterable[Dict[str, Any]]]) -> AsyncIterator[bytes]:
+    """Serialize rows as NDJSON on a background thread and yield them in chunks.
+
+    The scan never runs on the event loop, at most MAX_PENDING_CHUNKS chunks are
+    buffered ahead of the client, and the scan stops if the client disconnects.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    credits = threading.Semaphore(MAX_PENDING_CHUNKS)
+    stop = threading.Event()
+
+    def send(chunk: Optional[bytes]) -> None:
+        while not credits.acquire(timeout=0.5):
+            if stop.is_set():
+                raise _Stopped()
+        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+
+    def produce() -> None:
+        buffer = []
+        size = 0
+        try:
+            for row in rows_factory():
+                if stop.is_set():
+                    return
+                line = json.dumps(row, separators=(",", ":")) + "\n"
+                buffer.append(line)
+                size += len(line)
+                if size >= CHUNK_BYTES:
+                    send("".join(buffer).encode())
+                    buffer = []
+                    size = 0
+            if buffer:
+                send("".join(buffer).encode())
+        except _Stopped:
+            return
+        except Exception as e:
+            logger.error("Export failed: %s", e, exc_info=True)
+            try:
+                send((json.dumps({"error": str(e)}) + "\n").encode())
+            except _Stopped:
+                return
+        finally:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, None)
+            except RuntimeError:
+                pass  # Loop already closed
+
+    threading.Thread(target=produce, name="ndjson-export", daemon=True).start()
+    try:
+        while True:
+            chunk = await queue.get()
+            if chunk is None:
+                break
+            credits.release()
+            yield chunk
+    finally:
+        stop.set()
@@ -0,0 +1,278 @@
+import asyncio
+import logging
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional, Pattern, Set, Tuple
+
+from app.config import settings
+from app.services.admission_service import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BLOCK_BYTES = 256 * 1024
+# Upper bound on lines read per poll so a huge backlog is delivered in batches
+MAX_LINES_PER_POLL = 5000
+# A "line" with no newline in sight is flushed once it reaches this size
+MAX_LINE_BYTES = 64 * 1024
+MAX_PATTERN_LENGTH = 512
+# Floor for a subscriber's rate limit; anything lower would silently drop every line
+MIN_LINES_PER_SECOND = 1.0
+SUBSCRIBER_QUEUE_BATCHES = 256
+
+
+def tail_lines(path: str, count: int) -> List[str]:
+    """Last `count` lines of a file, reading backwards from the end in blocks"""
+    if count <= 0:
+        return []
+    try:
+        f = open(path, "rb")
+    except OSError:
+        return []
+    with f:
+        end = f.seek(0, os.SEEK_END)
+        blocks = []
+        newlines = 0
+        position = end
+        while position > 0 and newlines <= count:
+            size = min(BLOCK_BYTES, position)
+            position -= size
+            f.seek(position)
+            block = f.read(size)
+            blocks.append(block)
+            newlines += block.count(b"\n")
+    data = b"".join(reversed(blocks))
+    lines = data.split(b"\n")
+    if lines and lines[-1] == b"":
+        lines.pop()  # Trailing newline
+    return [line.decode(errors="replace").rstrip("\r") for line in lines[-count:]]
+
+
+class LogSubscriber:
+    """One websocket's view of a followed file: regex filter, rate limit and a bounded queue.
+
+    `select` runs the filter and is called off the event loop; `deliver` only rate-limits
+    and queues lines that already matched.
+    """
+
+    def __init__(self, pattern: Optional[Pattern], lines_per_second: float):
+        self.pattern = pattern
+        self.bucket = TokenBucket(lines_per_second, lines_per_second * 2)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_BATCHES)
+        self.dropped = 0
+
+    def select(self, lines: List[str]) -> List[str]:
+        if self.pattern is None:
+            return lines
+        return [line for line in lines if self.pattern.search(line)]
+
+    def deliver(self, events: List[str], lines: List[str]) -> None:
+        for event in events:
+            self._put({"type": event})
+        if not lines:
+            return
+        granted = self.bucket.take_up_to(len(lines), time.monotonic())
+        if granted < len(lines):
+            self.dropped += len(lines) - granted
+            lines = lines[:granted]
+        if lines:
+            self._put({"type": "lines", "lines": lines})
+
+    def _put(self, message: Dict[str, Any]) -> None:
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.dropped += len(message.get("lines", ())) or 1
+
+    def take_dropped(self) -> int:
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class FileFollower:
+    """Follows one file for all of its subscribers, like `tail -F`.
+
+    Starts at the end of the file and reads appended data in large blocks. A changed
+    inode means the file was rotated: the rest of the old file is drained and the new
+    one is read from the start. A size below the read position means truncation.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.subscribers: Set[LogSubscriber] = set()
+        self.lines_read = 0
+        self.rotations = 0
+        self.truncations = 0
+        self._task: Optional[asyncio.Task] = None
+        self._file = None
+        self._ident: Optional[Tuple[int, int]] = None
+        self._position = 0
+        self._partial = b""
+        self._opened_once = False
+
+    def ensure_running(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            while self.subscribers:
+                subscribers = list(self.subscribers)
+                try:
+                    # Filters run in the same thread as the read, so a slow client pattern
+                    # delays this file's followers but never the event loop
+                    events, lines, selected = await asyncio.to_thread(self._poll_and_select, subscribers)
+                except Exception as e:
+                    logger.error("Log follower for %s failed: %s", self.path, e)
+                    events, lines, selected = [], [], []
+                    self._close()
+                if events or lines:
+                    self.lines_read += len(lines)
+                    for subscriber, matched in zip(subscribers, selected):
+                        if subscriber in self.subscribers:
+                            subscriber.deliver(events, matched)
+                if len(lines) < MAX_LINES_PER_POLL:
+                    await asyncio.sleep(settings.LOG_FOLLOW_POLL_INTERVAL_SECONDS)
+        finally:
+            self._close()
+
+    def _open(self, at_end: bool) -> bool:
+        try:
+            f = open(self.path, "rb")
+        except OSError:
+            return False
+        stat = os.fstat(f.fileno())
+        self._file = f
+        self._ident = (stat.st_dev, stat.st_ino)
+        self._position = f.seek(0, os.SEEK_END) if at_end else 0
+        self._partial = b""
+        self._opened_once = True
+        return True
+
+    def _close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _poll_and_select(
+        self, subscribers: List[LogSubscriber]
+    ) -> Tuple[List[str], List[str], List[List[str]]]:
+        events, lines = self._poll()
+        return events, lines, [subscriber.select(lines) if lines else [] for subscriber in subscribers]
+
+    def _poll(self) -> Tuple[List[str], List[str]]:
+        events: List[str] = []
+        if self._file is None:
+            # First open starts at the end; a file that appears later is read from the start
+            if not self._open(at_end=not self._opened_once):
+                return events, []
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            stat = None  # Rotated away and not recreated yet: keep draining the old handle
+
+        lines: List[str] = []
+        if stat is not None and (stat.st_dev, stat.st_ino) != self._ident:
+            lines = self._read_available(flush=True)
+            self._close()
+            self._open(at_end=False)
+            self.rotations += 1
+            events.append("rotated")
+        elif stat is not None and stat.st_size < self._position:
+            self._file.seek(0)
+            self._position = 0
+            self._partial = b""
+            self.truncations += 1
+            events.append("truncated")
+        if self._file is not None:
+            lines.extend(self._read_available())
+        return events, lines
+
+    def _read_available(self, flush: bool = False) -> List[str]:
+        raw: List[bytes] = []
+        while len(raw) < MAX_LINES_PER_POLL:
+            block = self._file.read(BLOCK_BYTES)
+            if not block:
+                break
+            self._position += len(block)
+            parts = (self._partial + block).split(b"\n")
+            self._partial = parts.pop()
+            raw.extend(parts)
+        if self._partial and (flush or len(self._partial) >= MAX_LINE_BYTES):
+            raw.append(self._partial)
+            self._partial = b""
+        return [line.decode(errors="replace").rstrip("\r") for line in raw]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "subscribers": len(self.subscribers),
+            "position": self._position,
+            "lines_read": self.lines_read,
+            "rotations": self.rotations,
+            "truncations": self.truncations,
+        }
+
+
+class LogFollowService:
+    """Shares one FileFollower per file between any number of websocket subscribers"""
+
+    def __init__(self):
+        self.followers: Dict[str, FileFollower] = {}
+
+    def allowed_files(self) -> Dict[str, str]:
+        """Name clients may request -> absolute path"""
+        files = {}
+        entries = [settings.LOG_FILE] + settings.LOG_FOLLOW_FILES
+        if settings.SNAPSHOT_PLANE_ENABLED:
+            entries.append(settings.COLLECTOR_LOG_FILE)
+        for entry in entries:
+            path = os.path.abspath(entry)
+            files[os.path.basename(path)] = path
+            files[path] = path
+        return files
+
+    def resolve(self, name: str) -> str:
+        path = self.allowed_files().get(name)
+        if path is None:
+            raise ValueError(f"File is not followable: {name}")
+        return path
+
+    @staticmethod
+    def compile_filter(pattern: Optional[str]) -> Optional[Pattern]:
+        if not pattern:
+            return None
+        if len(pattern) > MAX_PATTERN_LENGTH:
+            raise ValueError("Filter pattern is too long")
+        try:
+            return re.compile(pattern)
+        except re.error as e:
+            raise ValueError(f"Invalid filter pattern: {e}")
+
+    async def subscribe(self, path: str, subscriber: LogSubscriber, backlog: int) -> List[str]:
+        """Attach a subscriber and return the file's last `backlog` lines (filtered)"""
+        lines = await asyncio.to_thread(lambda: subscriber.select(tail_lines(path, backlog))) if backlog else []
+        follower = self.followers.get(path)
+        if follower is None:
+            follower = self.followers[path] = FileFollower(path)
+        follower.subscribers.add(subscriber)
+        follower.ensure_running()
+        return lines
+
+    def unsubscribe(self, path: str, subscriber: LogSubscriber) -> None:
+        follower = self.followers.get(path)
+        if follower is None:
+            return
+        follower.subscribers.discard(subscriber)
+        if not follower.subscribers:
+            # The follower's task exits on its next poll
+            del self.followers[path]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "allowed": sorted({path for path in self.allowed_files().values()}),
+            "followers": [follower.stats() for follower in self.followers.values()],
+        }
+
+
+log_follow_service = LogFollowService()
@@ -1,95 +1,58 @@
 import psutil
 import logging
+import time
 from datetime import datetime
+from typing import Any, Callable, Dict, List, Tuple
+from app.config import settings
+from app.instrumentation import METRICS_SNAPSHOT_SECONDS
+from app.services.rate_service import rate_engine
 
 logger = logging.getLogger(__name__)
 
+# Collector groups and the snapshot fields each produces.
+# Subscribers pick fields or whole groups; only the groups they need are collected.
+FIELD_GROUPS = {
+    "cpu": ("cpu_usage", "cpu_count", "cpu_count_logical"),
+    "memory": ("memory_usage", "total_memory_gb", "available_memory_gb"),
+    "disk": ("disk_usage", "total_disk_gb", "free_disk_gb"),
+    "uptime": ("uptime",),
+    "network": ("network_sent_mb", "network_recv_mb"),
+    "rates": (
+        "network_sent_bytes_per_sec", "network_recv_bytes_per_sec",
+        "network_packets_sent_per_sec", "network_packets_recv_per_sec",
+        "disk_read_bytes_per_sec", "disk_write_bytes_per_sec", "disk_read_iops", "disk_write_iops",
+    ),
+    "processes": ("top_processes",),
+}
+FIELD_TO_GROUP = {field: group for group, fields in FIELD_GROUPS.items() for field in fields}
+ALL_GROUPS = tuple(FIELD_GROUPS)
+# Field order of the full snapshot, as clients have always received it
+SNAPSHOT_FIELDS = (
+    "cpu_usage", "memory_usage", "disk_usage",
+    "cpu_count", "cpu_count_logical", "total_memory_gb", "available_memory_gb",
+    "total_disk_gb", "free_disk_gb", "uptime",
+    "network_sent_mb", "network_recv_mb", *FIELD_GROUPS["rates"],
+    "top_processes",
+)
+
 class MetricsService:
+    def __init__(self):
+        # server_id -> (unix timestamp, snapshot) of the most recent sample
+        self.latest: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        self._listeners: List[Callable[[str, Dict[str, Any], float], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any], float], None]):
+        """Register a callback invoked as listener(server_id, snapshot, timestamp) on every sample"""
+        self._listeners.append(listener)
+
     def get_snapshot(self, server_id: str):
         """Get comprehensive system metrics using psutil (cross-platform)"""
         try:
-            # Basic metrics
-            cpu_usage = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            memory_usage = memory.percent
-            disk = psutil.disk_usage('/')
-            disk_usage = disk.percent
-            
-            # System uptime
-            boot_time = datetime.fromtimestamp(psutil.boot_time())
-            uptime = datetime.now() - boot_time
-            uptime_str = f"{uptime.days}d {uptime.seconds//3600}h {(uptime.seconds//60)%60}m"
-            
-            # CPU info
-            cpu_count = psutil.cpu_count(logical=False)  # Physical cores
-            cpu_count_logical = psutil.cpu_count(logical=True)  # Logical cores
-            
-            # Memory info
-            total_memory_gb = round(memory.total / (1024**3), 2)
-            available_memory_gb = round(memory.available / (1024**3), 2)
-            
-            # Disk info
-            total_disk_gb = round(disk.total / (1024**3), 2)
-            free_disk_gb = round(disk.free / (1024**3), 2)
-            
-            # Network info
-            net_io = psutil.net_io_counters()
-            bytes_sent_mb = round(net_io.bytes_sent / (1024**2), 2)
-            bytes_recv_mb = round(net_io.bytes_recv / (1024**2), 2)
-            
-            # Top 5 processes by CPU
-            top_processes = []
-            try:
-                processes = []
-                for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
-                    try:
-                        pinfo = proc.info
-                        if pinfo['cpu_percent'] is not None:
-                            processes.append(pinfo)
-                    except (psutil.NoSuchProcess, psutil.AccessDenied):
-                        pass
-                
-                # Sort by CPU usage and get top 5
-                processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
-                top_processes = [
-                    {
-                        "pid": p['pid'],
-                        "name": p['name'],
-                        "cpu": round(p['cpu_percent'] or 0, 1),
-                        "memory": round(p['memory_percent'] or 0, 1)
-                    }
-                    for p in processes[:5]
-                ]
-            except Exception as e:
-                logger.warning(f"Error getting process info: {e}")
-            
-            logger.info(f"Metrics for server {server_id}: CPU={cpu_usage}%, RAM={memory_usage}%, Disk={disk_usage}%")
-            
-            return {
-                # Basic metrics
-                "cpu_usage": round(cpu_usage, 1),
-                "memory_usage": round(memory_usage, 1),
-                "disk_usage": round(disk_usage, 1),
-                
-                # Detailed info
-                "cpu_count": cpu_count,
-                "cpu_count_logical": cpu_count_logical,
-                "total_memory_gb": total_memory_gb,
-                "available_memory_gb": available_memory_gb,
-                "total_disk_gb": total_disk_gb,
-                "free_disk_gb": free_disk_gb,
-                "uptime": uptime_str,
-                
-                # Network
-                "network_sent_mb": bytes_sent_mb,
-                "network_recv_mb": bytes_recv_mb,
-                
-                # Top processes
-                "top_processes": top_processes
-            }
+            with METRICS_SNAPSHOT_SECONDS.time():
+                snapshot = self._collect_snapshot(server_id)
         except Exception as e:
-            logger.error(f"Error getting metrics: {e}")
-            # Return minimal fallback data
+            logger.error("Error getting metrics: %s", e)
+            # Return minimal fallback data (not recorded or passed to listeners)
             return {
                 "cpu_usage": 0.0,
                 "memory_usage": 0.0,
@@ -105,5 +68,137 @@ class MetricsService:
                 "network_recv_mb": 0.0,
                 "top_processes": []
             }
+        if server_id not in settings.SERVER_IDS:
+            return snapshot  # Unconfigured ids are served but not kept or fanned out
+        timestamp = time.time()
+        self.latest[server_id] = (timestamp, snapshot)
+        for listener in self._listeners:
+            try:
+                listener(server_id, snapshot, timestamp)
+            except Exception as e:
+                logger.error("Metrics listener failed: %s", e, exc_info=True)
+        return snapshot
+
+    def _collect_snapshot(self, server_id: str):
+        """Collect a snapshot; raises on failure so callers can fall back"""
+        data = self.collect_groups(server_id, ALL_GROUPS)
+        logger.debug("Metrics for server %s: CPU=%s%%, RAM=%s%%, Disk=%s%%",
+                     server_id, data["cpu_usage"], data["memory_usage"], data["disk_usage"])
+        return {field: data[field] for field in SNAPSHOT_FIELDS}
+
+    def collect_groups(self, server_id: str, groups) -> Dict[str, Any]:
+        """Run only the collectors for the given field groups"""
+        data: Dict[str, Any] = {}
+        for group in groups:
+            data.update(getattr(self, f"_collect_{group}")(server_id))
+        return data
+
+    def get_projection(self, server_id: str, groups, fields) -> Dict[str, Any]:
+        """Collect the groups a subscription needs and return only its fields.
+
+        Unlike get_snapshot this does not update `latest` or notify listeners, since the
+        result is a partial sample.
+        """
+        data = self.collect_groups(server_id, groups)
+        return {field: data[field] for field in fields}
+
+    @staticmethod
+    def resolve_projection(fields=None, groups=None) -> Tuple[List[str], List[str]]:
+        """Map requested fields/groups to (collector groups, output fields); raises ValueError"""
+        fields = list(fields or [])
+        groups = list(groups or [])
+        unknown = [f for f in fields if f not in FIELD_TO_GROUP] + [g for g in groups if g not in FIELD_GROUPS]
+        if unknown:
+            raise ValueError(f"Unknown fields or groups: {', '.join(unknown)}")
+        if not fields and not groups:
+            groups = list(ALL_GROUPS)
+        needed = set(groups) | {FIELD_TO_GROUP[f] for f in fields}
+        wanted = set(fields) | {f for g in groups for f in FIELD_GROUPS[g]}
+        ordered_groups = [g for g in ALL_GROUPS if g in needed]
+        ordered_fields = [f for f in SNAPSHOT_FIELDS if f in wanted]
+        return ordered_groups, ordered_fields
+
+    def _collect_cpu(self, server_id: str):
+        # Basic metrics
+        cpu_usage = psutil.cpu_percent(interval=1)
+        return {
+            "cpu_usage": round(cpu_usage, 1),
+            "cpu_count": psutil.cpu_count(logical=False),  # Physical cores
+            "cpu_count_logical": psutil.cpu_count(logical=True),  # Logical cores
+        }
+
+    def _collect_memory(self, server_id: str):
+        memory = psutil.virtual_memory()
+        return {
+            "memory_usage": round(memory.percent, 1),
+            "total_memory_gb": round(memory.total / (1024**3), 2),
+            "available_memory_gb": round(memory.available / (1024**3), 2),
+        }
+
+    def _collect_disk(self, server_id: str):
+        disk = psutil.disk_usage('/')
+        return {
+            "disk_usage": round(disk.percent, 1),
+            "total_disk_gb": round(disk.total / (1024**3), 2),
+            "free_disk_gb": round(disk.free / (1024**3), 2),
+        }
+
+    def _collect_uptime(self, server_id: str):
+        # System uptime
+        boot_time = datetime.fromtimestamp(psutil.boot_time())
+        uptime = datetime.now() - boot_time
+        return {"uptime": f"{uptime.days}d {uptime.seconds//3600}h {(uptime.seconds//60)%60}m"}
+
+    def _collect_network(self, server_id: str):
+        # Network info (cumulative)
+        net_io = psutil.net_io_counters()
+        return {
+            "network_sent_mb": round(net_io.bytes_sent / (1024**2), 2),
+            "network_recv_mb": round(net_io.bytes_recv / (1024**2), 2),
+        }
+
+    def _collect_rates(self, server_id: str):
+        # Throughput (shared, cached counter deltas)
+        rates = rate_engine.get_rates(server_id)
+        net_rates = rates["network"]
+        disk_rates = rates["disk"]
+        return {
+            "network_sent_bytes_per_sec": net_rates["bytes_sent_per_sec"],
+            "network_recv_bytes_per_sec": net_rates["bytes_recv_per_sec"],
+            "network_packets_sent_per_sec": net_rates["packets_sent_per_sec"],
+            "network_packets_recv_per_sec": net_rates["packets_recv_per_sec"],
+            "disk_read_bytes_per_sec": disk_rates["read_bytes_per_sec"],
+            "disk_write_bytes_per_sec": disk_rates["write_bytes_per_sec"],
+            "disk_read_iops": disk_rates["read_iops"],
+            "disk_write_iops": disk_rates["write_iops"],
+        }
+
+    def _collect_processes(self, server_id: str):
+        # Top 5 processes by CPU
+        top_processes = []
+        try:
+            processes = []
+            for proc in psutil.process_iter(['pid', 'name', 'cpu_percent', 'memory_percent']):
+                try:
+                    pinfo = proc.info
+                    if pinfo['cpu_percent'] is not None:
+                        processes.append(pinfo)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    pass
+            
+            # Sort by CPU usage and get top 5
+            processes.sort(key=lambda x: x['cpu_percent'] or 0, reverse=True)
+            top_processes = [
+                {
+                    "pid": p['pid'],
+                    "name": p['name'],
+                    "cpu": round(p['cpu_percent'] or 0, 1),
+                    "memory": round(p['memory_percent'] or 0, 1)
+                }
+                for p in processes[:5]
+            ]
+        except Exception as e:
+            logger.warning("Error getting process info: %s", e)
+        return {"top_processes": top_processes}
 
 metrics_service = MetricsService()
@@ -0,0 +1,375 @@
+import logging
+import math
+import mmap
+import os
+import queue
+import re
+import struct
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.metrics_service import metrics_service
+from app.services.monitoring_service import monitoring_service
+
+logger = logging.getLogger(__name__)
+
+# Every column file is a flat sequence of little-endian (timestamp, value) float64 pairs
+RECORD = struct.Struct("<dd")
+RECORD_SIZE = RECORD.size
+
+# (tier name, resolution in seconds, segment span in seconds), finest first
+TIERS = (
+    ("raw", 0, 86400),
+    ("1m", 60, 7 * 86400),
+    ("1h", 3600, 90 * 86400),
+)
+
+HOST_METRICS = (
+    "cpu_usage", "memory_usage", "disk_usage", "available_memory_gb",
+    "free_disk_gb", "network_sent_mb", "network_recv_mb",
+    "network_sent_bytes_per_sec", "network_recv_bytes_per_sec",
+    "disk_read_bytes_per_sec", "disk_write_bytes_per_sec", "disk_read_iops", "disk_write_iops",
+)
+
+_SAFE_NAME = re.compile(r"^[A-Za-z0-9_.-]+$")
+
+
+def _safe_name(name: str) -> bool:
+    """Whether `name` can be used as a single path component under the store root"""
+    return bool(_SAFE_NAME.match(name)) and name not in (".", "..")
+
+
+def _known_server(server_id: str) -> bool:
+    return server_id in settings.SERVER_IDS and _safe_name(server_id)
+
+
+class _MappedSegment:
+    """Read-only memory map of one column file exposing zero-copy timestamp/value views"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "rb")
+        self._mmap = None
+        self._views: List[memoryview] = []
+        # Ignore a torn trailing record from an interrupted write
+        size = os.fstat(self._file.fileno()).st_size // RECORD_SIZE * RECORD_SIZE
+        if size == 0:
+            self.timestamps = self.values = ()
+            return
+        self._mmap = mmap.mmap(self._file.fileno(), size, access=mmap.ACCESS_READ)
+        raw = memoryview(self._mmap)
+        doubles = raw.cast("d")
+        self.timestamps = doubles[0::2]
+        self.values = doubles[1::2]
+        self._views = [raw, doubles, self.timestamps, self.values]
+
+    def close(self) -> None:
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+class MetricsStore:
+    """Embedded append-only time-series store.
+
+    Layout: <root>/<server_id>/<tier>/<metric>/<segment_start>.bin. Samples are queued by
+    listeners and appended by one writer thread, so callers never touch the disk. Range
+    queries memory-map only the segments that overlap the range and binary-search their
+    timestamp column, so cost is proportional to the points returned rather than the
+    history kept. The writer thread also compacts expired segments into the next,
+    coarser tier (bucket averages) and deletes data past the last tier's retention.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.retention = {
+            "raw": settings.METRICS_STORE_RAW_RETENTION_HOURS * 3600,
+            "1m": settings.METRICS_STORE_1M_RETENTION_DAYS * 86400,
+            "1h": settings.METRICS_STORE_1H_RETENTION_DAYS * 86400,
+        }
+        self._queue: queue.Queue = queue.Queue(maxsize=10000)
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # (server, tier, metric) -> (segment_start, open file)
+        self._handles: Dict[Tuple[str, str, str], Tuple[int, Any]] = {}
+        self._last_ts: Dict[Tuple[str, str, str], float] = {}
+        # (server, metric) -> timestamp of the last sample accepted by record()
+        self._last_recorded: Dict[Tuple[str, str], float] = {}
+        self._record_lock = threading.Lock()
+        self.written = 0
+        self.dropped = 0
+        self.last_compaction: Optional[float] = None
+
+    # Writing
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        os.makedirs(self.root, exist_ok=True)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._writer_loop, name="metrics-store-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def record(self, server_id: str, timestamp: float, values: Dict[str, float]) -> None:
+        """Queue one sample for writing; never blocks, drops when the writer is behind.
+
+        Metrics sampled less than METRICS_STORE_MIN_SAMPLE_INTERVAL_SECONDS after their last
+        accepted sample are skipped, so the raw tier grows with time rather than with the
+        number of clients asking for snapshots.
+        """
+        if self._thread is None or not _known_server(server_id):
+            return
+        interval = settings.METRICS_STORE_MIN_SAMPLE_INTERVAL_SECONDS
+        with self._record_lock:
+            due = {}
+            for metric, value in values.items():
+                key = (server_id, metric)
+                if timestamp - self._last_recorded.get(key, float("-inf")) >= interval:
+                    self._last_recorded[key] = timestamp
+                    due[metric] = value
+        if not due:
+            return
+        values = due
+        try:
+            self._queue.put_nowait((server_id, timestamp, values))
+        except queue.Full:
+            self.dropped += 1
+
+    def record_host_snapshot(self, server_id: str, snapshot: Dict[str, Any], timestamp: float) -> None:
+        self.record(server_id, timestamp, {name: snapshot[name] for name in HOST_METRICS if name in snapshot})
+
+    def record_monitoring_snapshot(self, server_id: str, snapshot: Dict[str, Any], timestamp: float) -> None:
+        values = {f"net_{key}": value for key, value in snapshot.get("network_stats", {}).items()}
+        for index, usage in enumerate(snapshot.get("cpu_per_core", [])):
+            values[f"cpu_core_{index}"] = usage
+        self.record(server_id, timestamp, values)
+
+    def _writer_loop(self) -> None:
+        next_compaction = time.time() + 60
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                server_id, timestamp, values = self._queue.get(timeout=1.0)
+                for metric, value in values.items():
+                    if isinstance(value, (int, float)) and _safe_name(metric):
+                        self._append(server_id, "raw", metric, timestamp, float(value))
+                self._flush()
+            except queue.Empty:
+                pass
+            except Exception as e:
+                logger.error("Metrics store write failed: %s", e, exc_info=True)
+            if time.time() >= next_compaction:
+                try:
+                    self.compact()
+                except Exception as e:
+                    logger.error("Metrics store compaction failed: %s", e, exc_info=True)
+                next_compaction = time.time() + settings.METRICS_STORE_COMPACT_INTERVAL_SECONDS
+        self._close_handles()
+
+    def _append(self, server_id: str, tier: str, metric: str, timestamp: float, value: float) -> None:
+        key = (server_id, tier, metric)
+        span = self._span(tier)
+        segment_start = int(timestamp // span * span)
+        handle = self._handles.get(key)
+        if handle is None or handle[0] != segment_start:
+            if handle is not None:
+                handle[1].close()
+            handle = (segment_start, self._open_segment(key, segment_start))
+            self._handles[key] = handle
+        # Segments must stay sorted for binary search; late samples are discarded
+        if timestamp <= self._last_ts.get(key, float("-inf")):
+            return
+        handle[1].write(RECORD.pack(timestamp, value))
+        self._last_ts[key] = timestamp
+        self.written += 1
+
+    def _open_segment(self, key: Tuple[str, str, str], segment_start: int):
+        directory = os.path.join(self.root, *key)
+        os.makedirs(directory, exist_ok=True)
+        handle = open(os.path.join(directory, f"{segment_start}.bin"), "ab")
+        size = handle.tell() // RECORD_SIZE * RECORD_SIZE
+        if handle.tell() != size:
+            handle.truncate(size)  # Drop a torn record so appends stay aligned
+        if size:
+            # Resume ordering checks from what is already on disk (e.g. after a restart)
+            with open(handle.name, "rb") as existing:
+                existing.seek(size - RECORD_SIZE)
+                last_ts, _ = RECORD.unpack(existing.read(RECORD_SIZE))
+            self._last_ts[key] = max(self._last_ts.get(key, last_ts), last_ts)
+        return handle
+
+    def _flush(self) -> None:
+        for _, handle in self._handles.values():
+            handle.flush()
+
+    def _close_handles(self) -> None:
+        for _, handle in self._handles.values():
+            handle.close()
+        self._handles.clear()
+
+    @staticmethod
+    def _span(tier: str) -> int:
+        return next(span for name, _, span in TIERS if name == tier)
+
+    # Compaction and retention
+
+    def compact(self, now: Optional[float] = None) -> None:
+        """Downsample segments past their tier's retention into the next tier; runs on the writer thread"""
+        now = now or time.time()
+        for server_id in self._list(self.root):
+            for index, (tier, _, span) in enumerate(TIERS):
+                next_tier = TIERS[index + 1] if index + 1 < len(TIERS) else None
+                tier_dir = os.path.join(self.root, server_id, tier)
+                for metric in self._list(tier_dir):
+                    for segment_start in self._segments(os.path.join(tier_dir, metric)):
+                        if segment_start + span > now - self.retention[tier]:
+                            break
+                        path = os.path.join(tier_dir, metric, f"{segment_start}.bin")
+                        if next_tier is not None:
+                            self._downsample(path, server_id, metric, next_tier)
+                        self._drop_segment(server_id, tier, metric, segment_start, path)
+        self._flush()
+        self.last_compaction = now
+
+    def _downsample(self, path: str, server_id: str, metric: str, tier: Tuple[str, int, int]) -> None:
+        name, resolution, _ = tier
+        segment = _MappedSegment(path)
+        try:
+            timestamps = segment.timestamps.tolist() if segment.timestamps else []
+            values = segment.values.tolist() if segment.values else []
+        finally:
+            segment.close()
+        bucket, total, count = None, 0.0, 0
+        for timestamp, value in zip(timestamps, values):
+            start = timestamp // resolution * resolution
+            if start != bucket:
+                if count:
+                    self._append(server_id, name, metric, bucket, total / count)
+                bucket, total, count = start, 0.0, 0
+            total += value
+            count += 1
+        if count:
+            self._append(server_id, name, metric, bucket, total / count)
+
+    def _drop_segment(self, server_id: str, tier: str, metric: str, segment_start: int, path: str) -> None:
+        handle = self._handles.get((server_id, tier, metric))
+        if handle is not None and handle[0] == segment_start:
+            handle[1].close()
+            del self._handles[(server_id, tier, metric)]
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    # Reading
+
+    @staticmethod
+    def _list(directory: str) -> List[str]:
+        try:
+            return sorted(os.listdir(directory))
+        except FileNotFoundError:
+            return []
+
+    def _segments(self, directory: str) -> List[int]:
+        return sorted(int(name[:-4]) for name in self._list(directory) if name.endswith(".bin") and name[:-4].isdigit())
+
+    def list_metrics(self, server_id: str) -> List[str]:
+        if not _known_server(server_id):
+            return []
+        names = set()
+        for tier, _, _ in TIERS:
+            names.update(self._list(os.path.join(self.root, server_id, tier)))
+        return sorted(names)
+
+    def query(self, server_id: str, metric: str, start: float, end: float, max_points: int = 1000) -> Dict[str, Any]:
+        """Return [timestamp, value] points in [start, end], thinned by striding to at most max_points.
+
+        Each tier only contributes the part of the range older than the finest tier that
+        has data, so recent points come from raw samples and old ones from rollups.
+        """
+        if not (_known_server(server_id) and _safe_name(metric)):
+            return {"metric": metric, "points": [], "tiers": []}
+
+        opened: List[_MappedSegment] = []
+        ranges = []  # (segment, lo, hi, tier)
+        covered_from = end
+        try:
+            for tier, _, span in TIERS:
+                directory = os.path.join(self.root, server_id, tier, metric)
+                segments = self._segments(directory)
+                if not segments:
+                    continue
+                upper = min(end, covered_from)
+                tier_oldest = None
+                for segment_start in segments:
+                    if segment_start + span < start or segment_start > upper:
+                        continue
+                    try:
+                        segment = _MappedSegment(os.path.join(directory, f"{segment_start}.bin"))
+                    except FileNotFoundError:
+                        continue  # Compacted away between listing and opening
+                    opened.append(segment)
+                    if not segment.timestamps:
+                        continue
+                    tier_oldest = segment.timestamps[0] if tier_oldest is None else min(tier_oldest, segment.timestamps[0])
+                    lo = bisect_left(segment.timestamps, start)
+                    hi = bisect_right(segment.timestamps, upper)
+                    if upper == covered_from and covered_from != end:
+                        hi = bisect_left(segment.timestamps, upper)
+                    if hi > lo:
+                        ranges.append((segment, lo, hi, tier))
+                if tier_oldest is not None:
+                    covered_from = min(covered_from, tier_oldest)
+
+            total = sum(hi - lo for _, lo, hi, _ in ranges)
+            stride = max(1, math.ceil(total / max_points)) if max_points > 0 else 1
+            ranges.sort(key=lambda item: item[0].timestamps[item[1]])
+            points: List[List[float]] = []
+            for segment, lo, hi, _ in ranges:
+                points.extend(zip(segment.timestamps[lo:hi:stride].tolist(), segment.values[lo:hi:stride].tolist()))
+            return {
+                "metric": metric,
+                "start": start,
+                "end": end,
+                "total_points": total,
+                "stride": stride,
+                "tiers": sorted({tier for _, _, _, tier in ranges}),
+                "points": points,
+            }
+        finally:
+            for segment in opened:
+                segment.close()
+
+    def stats(self) -> Dict[str, Any]:
+        segments = 0
+        size = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(".bin"):
+                    segments += 1
+                    size += os.path.getsize(os.path.join(dirpath, filename))
+        return {
+            "root": os.path.abspath(self.root),
+            "running": self._thread is not None,
+            "segments": segments,
+            "bytes": size,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "last_compaction": self.last_compaction,
+        }
+
+metrics_store = MetricsStore(settings.METRICS_STORE_DIR)
+metrics_service.add_listener(metrics_store.record_host_snapshot)
+monitoring_service.add_listener(metrics_store.record_monitoring_snapshot)
@@ -1,12 +1,24 @@
 import psutil
 import logging
-from typing import List, Dict, Any
+import os
+import time
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set
 from collections import defaultdict
+from app.config import settings
+from app.instrumentation import MONITORING_SNAPSHOT_SECONDS
+from app.services.rate_service import rate_engine
 
 logger = logging.getLogger(__name__)
 
 class MonitoringService:
     """Advanced monitoring service for processes and network"""
+
+    def __init__(self):
+        self._listeners: List[Callable[[str, Dict[str, Any], float], None]] = []
+
+    def add_listener(self, listener: Callable[[str, Dict[str, Any], float], None]):
+        """Register a callback invoked as listener(server_id, snapshot, timestamp) on every snapshot"""
+        self._listeners.append(listener)
     
     def get_detailed_processes(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get detailed process information"""
@@ -35,7 +47,7 @@ class MonitoringService:
             processes.sort(key=lambda x: x['cpu'], reverse=True)
             return processes[:limit]
         except Exception as e:
-            logger.error(f"Error getting processes: {e}", exc_info=True)
+            logger.error("Error getting processes: %s", e, exc_info=True)
             return []
     
     def get_network_connections(self, limit: int = 100) -> List[Dict[str, Any]]:
@@ -58,7 +70,7 @@ class MonitoringService:
             
             return connections[:limit]
         except Exception as e:
-            logger.error(f"Error getting network connections: {e}")
+            logger.error("Error getting network connections: %s", e)
             return []
     
     def get_network_stats(self) -> Dict[str, Any]:
@@ -74,7 +86,7 @@ class MonitoringService:
                 "errout": net_io.errout
             }
         except Exception as e:
-            logger.error(f"Error getting network stats: {e}")
+            logger.error("Error getting network stats: %s", e)
             return {
                 "bytes_sent": 0,
                 "bytes_recv": 0,
@@ -90,7 +102,7 @@ class MonitoringService:
             # Use interval=None for non-blocking call (returns usage since last call)
             return psutil.cpu_percent(interval=None, percpu=True)
         except Exception as e:
-            logger.error(f"Error getting CPU per core: {e}")
+            logger.error("Error getting CPU per core: %s", e)
             return []
     
     def get_port_usage(self) -> Dict[str, int]:
@@ -105,34 +117,49 @@ class MonitoringService:
                     pass
             return dict(port_counts)
         except Exception as e:
-            logger.error(f"Error getting port usage: {e}")
+            logger.error("Error getting port usage: %s", e)
             return {}
     
     def get_monitoring_snapshot(self, server_id: str) -> Dict[str, Any]:
         """Get comprehensive monitoring snapshot"""
-        return {
-            "processes": self.get_detailed_processes(),
-            "network_connections": self.get_network_connections(),
-            "network_stats": self.get_network_stats(),
-            "cpu_per_core": self.get_cpu_per_core(),
-            "port_usage": self.get_port_usage()
-        }
+        with MONITORING_SNAPSHOT_SECONDS.time():
+            rates = rate_engine.get_rates(server_id)
+            snapshot = {
+                "processes": self.get_detailed_processes(),
+                "network_connections": self.get_network_connections(),
+                "network_stats": self.get_network_stats(),
+                "cpu_per_core": self.get_cpu_per_core(),
+                "port_usage": self.get_port_usage(),
+                # Per-second rates: totals plus per-interface / per-disk breakdowns
+                "network_rates": {"total": rates["network"], "interfaces": rates["interfaces"]},
+                "disk_rates": {"total": rates["disk"], "disks": rates["disks"]},
+                "rate_interval": rates["interval"]
+            }
+        if server_id not in settings.SERVER_IDS:
+            return snapshot
+        timestamp = time.time()
+        for listener in self._listeners:
+            try:
+                listener(server_id, snapshot, timestamp)
+            except Exception as e:
+                logger.error("Monitoring listener failed: %s", e, exc_info=True)
+        return snapshot
     
     def terminate_process(self, pid: int) -> bool:
         """Terminate a process gracefully"""
         try:
             proc = psutil.Process(pid)
             proc.terminate()
-            logger.info(f"Process {pid} terminated successfully")
+            logger.info("Process %s terminated successfully", pid)
             return True
         except psutil.NoSuchProcess:
-            logger.warning(f"Process {pid} does not exist")
+            logger.warning("Process %s does not exist", pid)
             return False
         except psutil.AccessDenied:
-            logger.error(f"Access denied to terminate process {pid}")
+            logger.error("Access denied to terminate process %s", pid)
             return False
         except Exception as e:
-            logger.error(f"Error terminating process {pid}: {e}")
+            logger.error("Error terminating process %s: %s", pid, e)
             return False
     
     def kill_process(self, pid: int) -> bool:
@@ -140,16 +167,16 @@ class MonitoringService:
         try:
             proc = psutil.Process(pid)
             proc.kill()
-            logger.info(f"Process {pid} killed successfully")
+            logger.info("Process %s killed successfully", pid)
             return True
         except psutil.NoSuchProcess:
-            logger.warning(f"Process {pid} does not exist")
+            logger.warning("Process %s does not exist", pid)
             return False
         except psutil.AccessDenied:
-            logger.error(f"Access denied to kill process {pid}")
+            logger.error("Access denied to kill process %s", pid)
             return False
         except Exception as e:
-            logger.error(f"Error killing process {pid}: {e}")
+            logger.error("Error killing process %s: %s", pid, e)
             return False
     
     def suspend_process(self, pid: int) -> bool:
@@ -157,16 +184,16 @@ class MonitoringService:
         try:
             proc = psutil.Process(pid)
             proc.suspend()
-            logger.info(f"Process {pid} suspended successfully")
+            logger.info("Process %s suspended successfully", pid)
             return True
         except psutil.NoSuchProcess:
-            logger.warning(f"Process {pid} does not exist")
+            logger.warning("Process %s does not exist", pid)
             return False
         except psutil.AccessDenied:
-            logger.error(f"Access denied to suspend process {pid}")
+            logger.error("Access denied to suspend process %s", pid)
             return False
         except Exception as e:
-            logger.error(f"Error suspending process {pid}: {e}")
+            logger.error("Error suspending process %s: %s", pid, e)
             return False
     
     def resume_process(self, pid: int) -> bool:
@@ -174,16 +201,147 @@ class MonitoringService:
         try:
             proc = psutil.Process(pid)
             proc.resume()
-            logger.info(f"Process {pid} resumed successfully")
+            logger.info("Process %s resumed successfully", pid)
             return True
         except psutil.NoSuchProcess:
-            logger.warning(f"Process {pid} does not exist")
+            logger.warning("Process %s does not exist", pid)
             return False
         except psutil.AccessDenied:
-            logger.error(f"Access denied to resume process {pid}")
+            logger.error("Access denied to resume process %s", pid)
             return False
         except Exception as e:
-            logger.error(f"Error resuming process {pid}: {e}")
+            logger.error("Error resuming process %s: %s", pid, e)
+            return False
+
+    def select_processes(
+        self,
+        pids: Iterable[int] = (),
+        tree_root: Optional[int] = None,
+        include_root: bool = True,
+        name: Optional[str] = None,
+        username: Optional[str] = None,
+        allow_protected: bool = False
+    ) -> List[psutil.Process]:
+        """Resolve PID / process-tree / name+user selectors into a de-duplicated process list.
+
+        Tree members come parents-first so a supervisor is signalled before it can respawn
+        children. The backend's own process is never selected, and unless `allow_protected`
+        neither are PID 1 and the backend's ancestors.
+        """
+        selected: Dict[int, psutil.Process] = {}
+        excluded = {os.getpid()} if allow_protected else self.protected_pids()
+
+        def add(proc: psutil.Process):
+            if proc.pid not in excluded and proc.pid not in selected:
+                selected[proc.pid] = proc
+
+        if tree_root is not None:
+            try:
+                root = psutil.Process(tree_root)
+                if include_root:
+                    add(root)
+                for child in root.children(recursive=True):
+                    add(child)
+            except (psutil.NoSuchProcess, psutil.AccessDenied) as e:
+                logger.warning("Cannot walk process tree of %s: %s", tree_root, e)
+
+        for pid in pids:
+            try:
+                add(psutil.Process(pid))
+            except psutil.NoSuchProcess:
+                pass
+
+        if name or username:
+            for proc in psutil.process_iter(['name', 'username']):
+                info = proc.info
+                if name and info.get('name') != name:
+                    continue
+                if username and info.get('username') != username:
+                    continue
+                add(proc)
+
+        return list(selected.values())
+
+    @staticmethod
+    def protected_pids() -> Set[int]:
+        """PID 1, the backend itself and its ancestors (uvicorn reloader/master, supervisor, shell)"""
+        protected = {1, os.getpid()}
+        try:
+            proc = psutil.Process(os.getppid())
+            while proc is not None and proc.pid not in protected:
+                protected.add(proc.pid)
+                proc = proc.parent()
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+        return protected
+
+    def signal_processes(self, procs: List[psutil.Process], action: str, timeout: float = 5.0, escalate: bool = True) -> List[Dict[str, Any]]:
+        """Signal all processes in one pass, then wait for them together.
+
+        terminate/kill wait up to `timeout` seconds for exit; with `escalate`, survivors of a
+        terminate are killed and given a further grace period. Returns one outcome per PID.
+        """
+        def wait(targets, wait_timeout):
+            gone, alive = psutil.wait_procs(targets, timeout=wait_timeout)
+            # Exited processes we are not the parent of linger as zombies until reaped
+            zombies = [proc for proc in alive if self._is_zombie(proc)]
+            return gone + zombies, [proc for proc in alive if proc not in zombies]
+
+        results: Dict[int, Dict[str, Any]] = {}
+        signalled = []
+        for proc in procs:
+            entry = {"pid": proc.pid, "name": None, "outcome": "", "exit_code": None}
+            results[proc.pid] = entry
+            try:
+                entry["name"] = proc.name()
+                getattr(proc, action)()
+                signalled.append(proc)
+                entry["outcome"] = {"suspend": "suspended", "resume": "resumed"}.get(action, "signalled")
+            except psutil.NoSuchProcess:
+                entry["outcome"] = "not_found"
+            except psutil.AccessDenied:
+                entry["outcome"] = "access_denied"
+            except Exception as e:
+                entry["outcome"] = "error"
+                entry["error"] = str(e)
+
+        if action in ("terminate", "kill") and signalled:
+            gone, alive = wait(signalled, timeout)
+            for proc in gone:
+                results[proc.pid]["outcome"] = "terminated" if action == "terminate" else "killed"
+                results[proc.pid]["exit_code"] = self._exit_code(proc)
+            if alive and escalate and action == "terminate":
+                for proc in alive:
+                    try:
+                        proc.kill()
+                    except psutil.NoSuchProcess:
+                        pass
+                    except psutil.AccessDenied:
+                        results[proc.pid]["outcome"] = "access_denied"
+                gone, alive = wait(alive, min(timeout, 3.0))
+                for proc in gone:
+                    results[proc.pid]["outcome"] = "killed_after_timeout"
+                    results[proc.pid]["exit_code"] = self._exit_code(proc)
+            for proc in alive:
+                if results[proc.pid]["outcome"] != "access_denied":
+                    results[proc.pid]["outcome"] = "still_running"
+
+        logger.info("Batch %s on %d processes", action, len(procs))
+        return list(results.values())
+
+    @staticmethod
+    def _exit_code(proc: psutil.Process) -> Optional[int]:
+        # wait_procs only knows exit codes of our own children
+        code = getattr(proc, "returncode", None)
+        return int(code) if code is not None else None
+
+    @staticmethod
+    def _is_zombie(proc: psutil.Process) -> bool:
+        try:
+            return proc.status() == psutil.STATUS_ZOMBIE
+        except psutil.NoSuchProcess:
+            return True
+        except psutil.AccessDenied:
             return False
 
 monitoring_service = MonitoringService()
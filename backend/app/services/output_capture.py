@@ -0,0 +1,374 @@
+import logging
+import os
+import signal
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from typing import Any, Dict, Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 64 * 1024
+STREAMS = ("stdout", "stderr")
+
+
+class SpillBudget:
+    """Spill bytes on disk across all captures, capped at COMMAND_OUTPUT_MAX_SPILL_TOTAL_BYTES"""
+
+    def __init__(self):
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def reserve(self, size: int) -> int:
+        """Claim up to `size` bytes; returns how many were granted"""
+        with self._lock:
+            granted = max(0, min(size, settings.COMMAND_OUTPUT_MAX_SPILL_TOTAL_BYTES - self.used))
+            self.used += granted
+            return granted
+
+    def release(self, size: int) -> None:
+        with self._lock:
+            self.used = max(0, self.used - size)
+
+
+spill_budget = SpillBudget()
+
+
+class BoundedCapture:
+    """Captures one output stream with bounded memory.
+
+    Output is buffered in memory until it exceeds head_bytes + tail_bytes. From then on
+    everything is appended to a spill file and memory holds only the first head_bytes
+    and a ring of the last tail_bytes, which together form the preview.
+    """
+
+    def __init__(self, head_bytes: int, tail_bytes: int, max_spill_bytes: int):
+        self.head_bytes = head_bytes
+        self.tail_bytes = tail_bytes
+        self.max_spill_bytes = max_spill_bytes
+        self.total = 0
+        self.spilled = 0
+        self.spill_truncated = False
+        self.spill_path: Optional[str] = None
+        self._spill = None
+        self._buffer: Optional[bytearray] = bytearray()
+        self._head = b""
+        self._tail: deque = deque()
+        self._tail_size = 0
+
+    @property
+    def truncated(self) -> bool:
+        return self._buffer is None
+
+    def write(self, chunk: bytes) -> None:
+        self.total += len(chunk)
+        if self._buffer is not None:
+            self._buffer += chunk
+            if len(self._buffer) <= self.head_bytes + self.tail_bytes:
+                return
+            # Overflow: move everything so far to disk and keep only head and tail
+            buffered = bytes(self._buffer)
+            self._buffer = None
+            self._head = buffered[:self.head_bytes]
+            self._push_tail(buffered[-self.tail_bytes:] if self.tail_bytes else b"")
+            self._open_spill()
+            self._spill_write(buffered)
+            return
+        self._spill_write(chunk)
+        self._push_tail(chunk)
+
+    def _open_spill(self) -> None:
+        directory = settings.COMMAND_OUTPUT_SPILL_DIR or None
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fd, self.spill_path = tempfile.mkstemp(prefix="gauntlet-output-", suffix=".log", dir=directory)
+        self._spill = os.fdopen(fd, "wb")
+
+    def _spill_write(self, chunk: bytes) -> None:
+        room = min(len(chunk), self.max_spill_bytes - self.spilled)
+        granted = spill_budget.reserve(room) if room > 0 else 0
+        if granted < len(chunk):
+            chunk = chunk[:granted]
+            self.spill_truncated = True
+        if chunk:
+            self._spill.write(chunk)
+            self.spilled += len(chunk)
+
+    def _push_tail(self, chunk: bytes) -> None:
+        if not chunk or not self.tail_bytes:
+            return
+        if len(chunk) >= self.tail_bytes:
+            self._tail = deque([chunk[-self.tail_bytes:]])
+            self._tail_size = self.tail_bytes
+            return
+        self._tail.append(chunk)
+        self._tail_size += len(chunk)
+        while self._tail_size - len(self._tail[0]) >= self.tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+        excess = self._tail_size - self.tail_bytes
+        if excess > 0:
+            self._tail[0] = self._tail[0][excess:]
+            self._tail_size -= excess
+
+    def close(self) -> None:
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def discard(self) -> None:
+        self.close()
+        if self.spill_path:
+            _remove(self.spill_path)
+            spill_budget.release(self.spilled)
+            self.spill_path = None
+
+    def data(self) -> bytes:
+        """Full output when it fit in memory"""
+        return bytes(self._buffer) if self._buffer is not None else b""
+
+    def preview(self) -> str:
+        if not self.truncated:
+            return self._buffer.decode(errors="replace")
+        # Cut both slices on character boundaries; the trimmed bytes count as omitted
+        head = _utf8_complete(self._head)
+        tail = _utf8_start(b"".join(self._tail))
+        omitted = self.total - len(head) - len(tail)
+        return (
+            head.decode(errors="replace")
+            + f"\n\n... [{omitted} bytes omitted, {self.total} bytes total] ...\n\n"
+            + tail.decode(errors="replace")
+        )
+
+
+class CommandOutput:
+    """Exit code plus bounded captures of a finished command"""
+
+    def __init__(self, exit_code: int, stdout: BoundedCapture, stderr: BoundedCapture):
+        self.returncode = exit_code
+        self.stdout = stdout
+        self.stderr = stderr
+        self.output_id: Optional[str] = None
+
+    @property
+    def truncated(self) -> bool:
+        return self.stdout.truncated or self.stderr.truncated
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _drop_stream(stream: Dict[str, Any]) -> None:
+    if stream["path"]:
+        _remove(stream["path"])
+        spill_budget.release(stream["stored_bytes"])
+
+
+def _utf8_complete(raw: bytes) -> bytes:
+    """`raw` minus a UTF-8 sequence cut off at its end, so pages never split a character"""
+    for back in range(1, min(4, len(raw)) + 1):
+        byte = raw[-back]
+        if byte & 0xC0 == 0x80:
+            continue  # Continuation byte: keep looking for the sequence start
+        needed = 4 if byte >= 0xF0 else 3 if byte >= 0xE0 else 2 if byte >= 0xC0 else 1
+        # Never trim a page to nothing: that would stall a client paging through binary output
+        if needed > back and back < len(raw):
+            return raw[:-back]
+        return raw
+    return raw
+
+
+def _utf8_start(raw: bytes) -> bytes:
+    """`raw` minus the continuation bytes of a character cut off at its start"""
+    skip = 0
+    while skip < min(3, len(raw) - 1) and raw[skip] & 0xC0 == 0x80:
+        skip += 1
+    return raw[skip:]
+
+
+def _pump(pipe, capture: BoundedCapture) -> None:
+    with pipe:
+        for chunk in iter(lambda: pipe.read(READ_CHUNK), b""):
+            capture.write(chunk)
+
+
+def _kill(proc: subprocess.Popen) -> None:
+    # shell=True: kill the whole group so grandchildren release the pipes too
+    try:
+        if os.name == "posix":
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def run_command(command: str, timeout: float, head_bytes: Optional[int] = None, tail_bytes: Optional[int] = None) -> CommandOutput:
+    """Run a shell command with bounded output capture.
+
+    Raises subprocess.TimeoutExpired like subprocess.run. Truncated output is registered
+    with `output_store` and can be paged through via `output_id`.
+    """
+    head_bytes = settings.COMMAND_OUTPUT_HEAD_BYTES if head_bytes is None else head_bytes
+    tail_bytes = settings.COMMAND_OUTPUT_TAIL_BYTES if tail_bytes is None else tail_bytes
+    captures = {
+        stream: BoundedCapture(head_bytes, tail_bytes, settings.COMMAND_OUTPUT_MAX_SPILL_BYTES)
+        for stream in STREAMS
+    }
+    proc = subprocess.Popen(
+        command,
+        shell=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        start_new_session=os.name == "posix",
+    )
+    readers = [
+        threading.Thread(target=_pump, args=(getattr(proc, stream), captures[stream]), daemon=True)
+        for stream in STREAMS
+    ]
+    for reader in readers:
+        reader.start()
+    deadline = time.monotonic() + timeout
+    try:
+        proc.wait(timeout=timeout)
+        # A backgrounded grandchild can hold the pipes open after the shell exits
+        for reader in readers:
+            reader.join(timeout=max(0.0, deadline - time.monotonic()))
+        if any(reader.is_alive() for reader in readers):
+            raise subprocess.TimeoutExpired(command, timeout)
+    except subprocess.TimeoutExpired:
+        _kill(proc)
+        proc.wait()
+        for reader in readers:
+            reader.join(timeout=1)
+        for capture in captures.values():
+            capture.discard()
+        raise
+    for capture in captures.values():
+        capture.close()
+
+    result = CommandOutput(proc.returncode, captures["stdout"], captures["stderr"])
+    if result.truncated:
+        result.output_id = output_store.register(command, result)
+    return result
+
+
+class OutputStore:
+    """Full output of truncated commands, kept on disk for ranged retrieval.
+
+    Entries expire after COMMAND_OUTPUT_RETENTION_SECONDS and at most
+    COMMAND_OUTPUT_MAX_ENTRIES are kept; the oldest spill files are deleted first.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def register(self, command: str, result: CommandOutput) -> str:
+        output_id = uuid.uuid4().hex
+        streams = {}
+        for stream in STREAMS:
+            capture: BoundedCapture = getattr(result, stream)
+            streams[stream] = {
+                "path": capture.spill_path,
+                # Untruncated streams are small enough to keep in memory
+                "data": None if capture.truncated else capture.data(),
+                "total_bytes": capture.total,
+                "stored_bytes": capture.spilled if capture.truncated else capture.total,
+                "spill_truncated": capture.spill_truncated,
+            }
+        with self._lock:
+            self._prune(time.time())
+            self._entries[output_id] = {
+                "command": command,
+                "created": time.time(),
+                "exit_code": result.returncode,
+                "streams": streams,
+            }
+        return output_id
+
+    def _prune(self, now: float) -> None:
+        expired = [
+            output_id for output_id, entry in self._entries.items()
+            if now - entry["created"] > settings.COMMAND_OUTPUT_RETENTION_SECONDS
+        ]
+        overflow = len(self._entries) - len(expired) - settings.COMMAND_OUTPUT_MAX_ENTRIES + 1
+        if overflow > 0:
+            remaining = sorted(
+                (output_id for output_id in self._entries if output_id not in expired),
+                key=lambda output_id: self._entries[output_id]["created"],
+            )
+            expired.extend(remaining[:overflow])
+        for output_id in expired:
+            for stream in self._entries.pop(output_id)["streams"].values():
+                _drop_stream(stream)
+
+    def describe(self, output_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(output_id)
+            if entry is None:
+                return None
+            return {
+                "output_id": output_id,
+                "command": entry["command"],
+                "created": entry["created"],
+                "exit_code": entry["exit_code"],
+                "streams": {
+                    name: {key: stream[key] for key in ("total_bytes", "stored_bytes", "spill_truncated")}
+                    for name, stream in entry["streams"].items()
+                },
+            }
+
+    def read(self, output_id: str, stream: str, offset: int, length: int) -> Optional[Dict[str, Any]]:
+        """Up to `length` bytes of a stream starting at byte `offset`.
+
+        The page ends on a UTF-8 character boundary, so it may be up to 3 bytes short;
+        clients continue from `next_offset`.
+        """
+        with self._lock:
+            entry = self._entries.get(output_id)
+            if entry is None:
+                return None
+            info = dict(entry["streams"][stream])
+        length = min(length, settings.COMMAND_OUTPUT_MAX_RANGE_BYTES)
+        if info["data"] is not None:
+            raw = info["data"][offset:offset + length]
+        else:
+            try:
+                with open(info["path"], "rb") as f:
+                    f.seek(offset)
+                    raw = f.read(length)
+            except OSError:
+                return None  # Pruned between lookup and read
+        if offset + len(raw) < info["stored_bytes"]:
+            raw = _utf8_complete(raw)
+        next_offset = offset + len(raw)
+        return {
+            "output_id": output_id,
+            "stream": stream,
+            "offset": offset,
+            "length": len(raw),
+            "next_offset": next_offset,
+            "total_bytes": info["total_bytes"],
+            "stored_bytes": info["stored_bytes"],
+            "eof": next_offset >= info["stored_bytes"],
+            "data": raw.decode(errors="replace"),
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            for entry in self._entries.values():
+                for stream in entry["streams"].values():
+                    _drop_stream(stream)
+            self._entries.clear()
+
+
+output_store = OutputStore()
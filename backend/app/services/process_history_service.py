@@ -0,0 +1,257 @@
+import asyncio
+import logging
+import threading
+import time
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+import psutil
+
+from app.config import settings
+from app.services.snapshot_plane import published_snapshot
+
+logger = logging.getLogger(__name__)
+
+ProcessKey = Tuple[int, float]  # (pid, create_time) survives PID reuse
+# (key, name, username, (cpu, rss_mb, threads, read_bytes, write_bytes))
+ProcessRow = Tuple[ProcessKey, str, str, Tuple[float, ...]]
+
+
+def rows_to_json(rows: List[ProcessRow]) -> List[list]:
+    return [[key[0], key[1], name, username, *values] for key, name, username, values in rows]
+
+
+def rows_from_json(rows: List[list]) -> List[ProcessRow]:
+    return [((row[0], row[1]), row[2], row[3], tuple(row[4:])) for row in rows]
+
+
+class _Slot:
+    __slots__ = ("index", "head", "count", "name", "username", "first_seen", "last_seen", "last_top", "alive")
+
+    def __init__(self, index: int, name: str, username: str, now: float):
+        self.index = index
+        self.head = 0
+        self.count = 0
+        self.name = name
+        self.username = username
+        self.first_seen = now
+        self.last_seen = now
+        self.last_top = now
+        self.alive = True
+
+
+class ProcessHistoryStore:
+    """Fixed-size per-process ring buffers backed by preallocated arrays.
+
+    Each field is one flat array('d') of max_processes * capacity doubles; a tracked
+    process owns one slot (a contiguous row) and writes into it as a ring. Total memory
+    is fixed at construction regardless of process churn. When every slot is taken the
+    least recently relevant process is evicted.
+    """
+
+    FIELDS = ("timestamp", "cpu", "rss_mb", "threads", "read_bytes", "write_bytes")
+
+    def __init__(self, max_processes: int, capacity: int):
+        self.max_processes = max_processes
+        self.capacity = capacity
+        size = max_processes * capacity
+        self._columns = {field: array("d", bytes(8 * size)) for field in self.FIELDS}
+        self._free: List[int] = list(range(max_processes - 1, -1, -1))
+        self._slots: Dict[ProcessKey, _Slot] = {}
+        self._by_pid: Dict[int, ProcessKey] = {}
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self._columns.values())
+
+    def record(self, key: ProcessKey, name: str, username: str, values: Tuple[float, ...], now: float, in_top: bool) -> None:
+        with self._lock:
+            slot = self._slots.get(key)
+            if slot is None:
+                if not in_top:
+                    return
+                slot = self._allocate(key, name, username, now)
+            slot.last_seen = now
+            slot.alive = True
+            if in_top:
+                slot.last_top = now
+            offset = slot.index * self.capacity + slot.head
+            for column, value in zip(self._columns.values(), (now,) + values):
+                column[offset] = value
+            slot.head = (slot.head + 1) % self.capacity
+            slot.count = min(slot.count + 1, self.capacity)
+
+    def _allocate(self, key: ProcessKey, name: str, username: str, now: float) -> _Slot:
+        if not self._free:
+            # Prefer evicting dead processes, then the one longest out of the top-N
+            victim = min(self._slots.items(), key=lambda item: (item[1].alive, item[1].last_top))[0]
+            self._release(victim)
+            self.evictions += 1
+        slot = _Slot(self._free.pop(), name, username, now)
+        self._slots[key] = slot
+        self._by_pid[key[0]] = key
+        return slot
+
+    def _release(self, key: ProcessKey) -> None:
+        slot = self._slots.pop(key)
+        if self._by_pid.get(key[0]) == key:
+            del self._by_pid[key[0]]
+        self._free.append(slot.index)
+
+    def sweep(self, seen: set, now: float, retention: float) -> None:
+        """Mark unseen processes dead and evict ones idle or dead for longer than `retention`"""
+        with self._lock:
+            for key, slot in list(self._slots.items()):
+                if key not in seen:
+                    slot.alive = False
+                idle_since = slot.last_top if slot.alive else slot.last_seen
+                if now - idle_since > retention:
+                    self._release(key)
+
+    def is_tracked(self, key: ProcessKey) -> bool:
+        return key in self._slots
+
+    def history(self, pid: int, create_time: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            key = (pid, create_time) if create_time is not None else self._by_pid.get(pid)
+            slot = self._slots.get(key) if key else None
+            if slot is None:
+                return None
+            start = slot.index * self.capacity
+            order = [(slot.head - slot.count + i) % self.capacity for i in range(slot.count)]
+            series = {
+                field: [column[start + i] for i in order]
+                for field, column in self._columns.items()
+            }
+            meta = {
+                "pid": key[0],
+                "create_time": key[1],
+                "name": slot.name,
+                "username": slot.username,
+                "alive": slot.alive,
+                "first_seen": slot.first_seen,
+                "last_seen": slot.last_seen,
+            }
+
+        timestamps = series["timestamp"]
+        for field in ("read_bytes", "write_bytes"):
+            cumulative = series.pop(field)
+            rates = [0.0]
+            for i in range(1, len(cumulative)):
+                elapsed = timestamps[i] - timestamps[i - 1]
+                delta = cumulative[i] - cumulative[i - 1]
+                rates.append(round(delta / elapsed, 1) if elapsed > 0 and delta >= 0 else 0.0)
+            series[f"{field}_per_sec"] = rates[:len(cumulative)]
+        series["threads"] = [int(v) for v in series["threads"]]
+        return {**meta, "samples": len(timestamps), "series": series}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "tracked": len(self._slots),
+                "max_processes": self.max_processes,
+                "samples_per_process": self.capacity,
+                "evictions": self.evictions,
+                "memory_bytes": self.memory_bytes,
+            }
+
+
+class ProcessHistoryService:
+    """Samples the process table on an interval and records the top-N into the store.
+
+    With the snapshot plane the collector process samples instead and publishes the
+    rows; every worker replays each published sample into its own store, so all
+    workers serve the same history.
+    """
+
+    ATTRS = ['pid', 'name', 'username', 'create_time', 'cpu_percent', 'memory_info', 'num_threads', 'io_counters']
+
+    def __init__(self):
+        self.store = ProcessHistoryStore(
+            max_processes=settings.PROCESS_HISTORY_MAX_PROCESSES,
+            capacity=settings.PROCESS_HISTORY_SAMPLES,
+        )
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, shared: bool = False) -> None:
+        if self._task is None:
+            loop = asyncio.get_running_loop()
+            self._task = loop.create_task(self._follow_loop() if shared else self._sample_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _sample_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self.sample)
+            except Exception as e:
+                logger.error("Process history sampling failed: %s", e, exc_info=True)
+            await asyncio.sleep(settings.PROCESS_HISTORY_INTERVAL_SECONDS)
+
+    async def _follow_loop(self) -> None:
+        last = 0.0
+        while True:
+            try:
+                published = published_snapshot("processes")
+                if published is not None and published[1]["timestamp"] > last:
+                    sample = published[1]
+                    last = sample["timestamp"]
+                    await asyncio.to_thread(self.ingest, rows_from_json(sample["rows"]), last)
+            except Exception as e:
+                logger.error("Process history follow failed: %s", e, exc_info=True)
+            # Twice per publish interval so no sample is skipped
+            await asyncio.sleep(settings.PROCESS_HISTORY_INTERVAL_SECONDS / 2)
+
+    def sample(self) -> None:
+        self.ingest(self.collect(), time.time())
+
+    def collect(self) -> List[ProcessRow]:
+        """One row per process in the table"""
+        rows = []
+        for proc in psutil.process_iter(self.ATTRS):
+            info = proc.info
+            if info.get('create_time') is None:
+                continue
+            memory = info.get('memory_info')
+            io = info.get('io_counters')
+            rows.append((
+                (info['pid'], info['create_time']),
+                info.get('name') or 'Unknown',
+                info.get('username') or 'N/A',
+                (
+                    info.get('cpu_percent') or 0.0,
+                    memory.rss / (1024 ** 2) if memory else 0.0,
+                    float(info.get('num_threads') or 0),
+                    float(io.read_bytes) if io else 0.0,
+                    float(io.write_bytes) if io else 0.0,
+                ),
+            ))
+        return rows
+
+    def ingest(self, rows: List[ProcessRow], now: float) -> None:
+        """Record a sample of the process table taken at `now`"""
+        top_n = settings.PROCESS_HISTORY_TOP_N
+        top = {row[0] for row in sorted(rows, key=lambda row: row[3][0], reverse=True)[:top_n]}
+        top.update(row[0] for row in sorted(rows, key=lambda row: row[3][1], reverse=True)[:top_n])
+
+        seen = set()
+        for key, name, username, values in rows:
+            seen.add(key)
+            in_top = key in top
+            if in_top or self.store.is_tracked(key):
+                self.store.record(key, name, username, values, now, in_top)
+        self.store.sweep(seen, now, settings.PROCESS_HISTORY_RETENTION_SECONDS)
+
+    def get_history(self, pid: int, create_time: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        return self.store.history(pid, create_time)
+
+process_history_service = ProcessHistoryService()
@@ -0,0 +1,147 @@
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Tuple
+
+import psutil
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+NET_FIELDS = ("bytes_sent", "bytes_recv", "packets_sent", "packets_recv", "errin", "errout", "dropin", "dropout")
+DISK_FIELDS = ("read_count", "write_count", "read_bytes", "write_bytes")
+
+# Output names for the per-second rates of each disk counter
+DISK_RATE_NAMES = {
+    "read_count": "read_iops",
+    "write_count": "write_iops",
+    "read_bytes": "read_bytes_per_sec",
+    "write_bytes": "write_bytes_per_sec",
+}
+
+WRAP_32 = 2 ** 32
+
+
+def counter_delta(previous: int, current: int) -> int:
+    """Delta between two readings of a monotonically increasing counter.
+
+    A decrease is either a 32-bit wrap (previous was close to 2^32) or a reset such as
+    an interface being re-created or a driver reload, in which case the counter has
+    restarted from zero and `current` is the best estimate of the increase.
+    """
+    if current >= previous:
+        return current - previous
+    if previous < WRAP_32 and previous > WRAP_32 * 0.75:
+        return current + WRAP_32 - previous
+    return current
+
+
+SYS_BLOCK = "/sys/class/block"
+
+
+def _counted_in_totals(device: str) -> bool:
+    """Whether a disk's I/O belongs in the totals: whole, non-stacked devices only.
+
+    Partitions repeat their parent disk's I/O, and device-mapper, md and loop devices
+    repeat the I/O of the disks (or files) underneath them. On Linux this is read from
+    sysfs; elsewhere psutil only reports whole disks, so everything counts.
+    """
+    path = os.path.join(SYS_BLOCK, device.replace("/", "!"))
+    if not os.path.isdir(path):
+        return True
+    if os.path.exists(os.path.join(path, "partition")) or os.path.exists(os.path.join(path, "loop")):
+        return False
+    try:
+        return not os.listdir(os.path.join(path, "slaves"))
+    except OSError:
+        return True
+
+
+class CounterRateEngine:
+    """Turns cumulative network and disk counters into per-second rates.
+
+    One sample reads every interface and disk with a single pernic/perdisk call each,
+    derives per-device rates and totals in the same pass, and is cached for
+    `min_interval` seconds so any number of clients share it.
+    """
+
+    def __init__(self, min_interval: float = 0.5):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        # server_id -> (monotonic time, {(kind, device): counters tuple})
+        self._previous: Dict[str, Tuple[float, Dict[Tuple[str, str], Tuple[int, ...]]]] = {}
+        self._cache: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # disk name -> counted in totals; devices rarely appear, so sysfs is read once each
+        self._counted_disks: Dict[str, bool] = {}
+
+    def get_rates(self, server_id: str) -> Dict[str, Any]:
+        if server_id not in settings.SERVER_IDS:
+            server_id = ""  # Unconfigured ids share one state instead of adding their own
+        with self._lock:
+            now = time.monotonic()
+            cached = self._cache.get(server_id)
+            if cached and now - cached[0] < self.min_interval:
+                return cached[1]
+            rates = self._sample(server_id, now)
+            self._cache[server_id] = (now, rates)
+            return rates
+
+    def _disk_counted(self, device: str) -> bool:
+        counted = self._counted_disks.get(device)
+        if counted is None:
+            counted = self._counted_disks[device] = _counted_in_totals(device)
+        return counted
+
+    def _sample(self, server_id: str, now: float) -> Dict[str, Any]:
+        counters: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        try:
+            for nic, stats in psutil.net_io_counters(pernic=True).items():
+                counters[("net", nic)] = tuple(getattr(stats, field) for field in NET_FIELDS)
+        except Exception as e:
+            logger.warning("Error reading network counters: %s", e)
+        try:
+            for disk, stats in (psutil.disk_io_counters(perdisk=True) or {}).items():
+                counters[("disk", disk)] = tuple(getattr(stats, field) for field in DISK_FIELDS)
+        except Exception as e:
+            logger.warning("Error reading disk counters: %s", e)
+
+        previous = self._previous.get(server_id)
+        self._previous[server_id] = (now, counters)
+        elapsed = now - previous[0] if previous else 0.0
+        prev_counters = previous[1] if previous else {}
+
+        interfaces: Dict[str, Dict[str, float]] = {}
+        disks: Dict[str, Dict[str, float]] = {}
+        net_total = dict.fromkeys((f"{field}_per_sec" for field in NET_FIELDS), 0.0)
+        disk_total = dict.fromkeys(DISK_RATE_NAMES.values(), 0.0)
+
+        for (kind, device), values in counters.items():
+            before = prev_counters.get((kind, device))
+            if kind == "net":
+                fields, names, out, total = NET_FIELDS, None, interfaces, net_total
+            else:
+                fields, names, out, total = DISK_FIELDS, DISK_RATE_NAMES, disks, disk_total
+            counted = kind == "net" or self._disk_counted(device)
+            device_rates = {}
+            for index, field in enumerate(fields):
+                name = names[field] if names else f"{field}_per_sec"
+                if before is None or elapsed <= 0:
+                    rate = 0.0
+                else:
+                    rate = counter_delta(before[index], values[index]) / elapsed
+                device_rates[name] = round(rate, 2)
+                if counted:
+                    total[name] += rate
+            out[device] = device_rates
+
+        return {
+            "interval": round(elapsed, 3),
+            "network": {name: round(value, 2) for name, value in net_total.items()},
+            "disk": {name: round(value, 2) for name, value in disk_total.items()},
+            "interfaces": interfaces,
+            "disks": disks,
+        }
+
+rate_engine = CounterRateEngine()
@@ -0,0 +1,231 @@
+import asyncio
+import json
+import logging
+import os
+import struct
+import subprocess
+import sys
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so the plane cannot elect a collector
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"GSNP"
+VERSION = 2
+HEADER = struct.Struct("<4sIII")  # magic, version, channel count, channel size
+HEADER_SIZE = 64
+# Per channel: sequence (odd while a write is in progress), payload length, publish time
+CHANNEL_HEADER = struct.Struct("<QId")
+CHANNEL_HEADER_SIZE = 24
+SEQ = struct.Struct("<Q")
+
+CHANNELS = {"metrics": 0, "monitoring": 1, "processes": 2, "alerts": 3}
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SnapshotPlane:
+    """Latest-value snapshots in shared memory, guarded by a per-channel seqlock.
+
+    One collector process publishes JSON payloads (host metrics, the monitoring snapshot,
+    the process table for process history, and alert state); any number of uvicorn
+    workers read them. A reader copies the payload out between two reads of the sequence number and
+    retries if they differ or the sequence is odd (a write was in progress), so readers
+    never block the writer or each other.
+    """
+
+    def __init__(self, name: str, channel_size: int):
+        self.name = name
+        self.channel_size = channel_size
+        self.size = HEADER_SIZE + len(CHANNELS) * channel_size
+        self._shm: Optional[shared_memory.SharedMemory] = None
+        # channel -> (sequence, timestamp, payload bytes, parsed dict or None)
+        self._cache: Dict[str, Tuple[int, float, bytes, Optional[Dict[str, Any]]]] = {}
+
+    def _detach_tracker(self, shm: shared_memory.SharedMemory) -> None:
+        # The resource tracker would unlink the segment when *this* process exits,
+        # pulling it out from under every other worker
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+
+    def create(self) -> None:
+        """Create (or reuse) the segment; called by the collector"""
+        try:
+            shm = shared_memory.SharedMemory(name=self.name, create=True, size=self.size)
+        except FileExistsError:
+            shm = shared_memory.SharedMemory(name=self.name)
+            if shm.size < self.size:
+                shm.close()
+                shm.unlink()
+                shm = shared_memory.SharedMemory(name=self.name, create=True, size=self.size)
+        self._detach_tracker(shm)
+        HEADER.pack_into(shm.buf, 0, MAGIC, VERSION, len(CHANNELS), self.channel_size)
+        self._shm = shm
+
+    def attach(self) -> bool:
+        """Attach to an existing segment; returns False until a collector has created it"""
+        if self._shm is not None:
+            return True
+        try:
+            shm = shared_memory.SharedMemory(name=self.name)
+        except FileNotFoundError:
+            return False
+        self._detach_tracker(shm)
+        magic, version, channels, channel_size = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION or channel_size != self.channel_size:
+            shm.close()
+            return False
+        self._shm = shm
+        return True
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def _offset(self, channel: str) -> int:
+        return HEADER_SIZE + CHANNELS[channel] * self.channel_size
+
+    def publish(self, channel: str, payload: bytes) -> bool:
+        buf = self._shm.buf
+        offset = self._offset(channel)
+        if len(payload) > self.channel_size - CHANNEL_HEADER_SIZE:
+            logger.error("Snapshot for %s is %d bytes, larger than the %d byte channel",
+                         channel, len(payload), self.channel_size - CHANNEL_HEADER_SIZE)
+            return False
+        sequence = SEQ.unpack_from(buf, offset)[0]
+        if sequence % 2:
+            sequence += 1  # A previous writer died mid-write
+        SEQ.pack_into(buf, offset, sequence + 1)
+        start = offset + CHANNEL_HEADER_SIZE
+        buf[start:start + len(payload)] = payload
+        CHANNEL_HEADER.pack_into(buf, offset, sequence + 1, len(payload), time.time())
+        SEQ.pack_into(buf, offset, sequence + 2)
+        return True
+
+    def read_raw(self, channel: str, retries: int = 50) -> Optional[Tuple[int, float, bytes]]:
+        """Consistent (sequence, timestamp, payload) for a channel, or None if unavailable"""
+        if self._shm is None and not self.attach():
+            return None
+        buf = self._shm.buf
+        offset = self._offset(channel)
+        capacity = self.channel_size - CHANNEL_HEADER_SIZE
+        for _ in range(retries):
+            sequence, length, timestamp = CHANNEL_HEADER.unpack_from(buf, offset)
+            if sequence == 0:
+                return None  # Never published
+            if sequence % 2 or length > capacity:
+                time.sleep(0)
+                continue
+            cached = self._cache.get(channel)
+            if cached and cached[0] == sequence:
+                return cached[0], cached[1], cached[2]
+            start = offset + CHANNEL_HEADER_SIZE
+            payload = bytes(buf[start:start + length])
+            if SEQ.unpack_from(buf, offset)[0] == sequence:
+                self._cache[channel] = (sequence, timestamp, payload, None)
+                return sequence, timestamp, payload
+        return None
+
+    def read_fresh(self, channel: str) -> Optional[Tuple[float, bytes]]:
+        """Payload if it was published within SNAPSHOT_PLANE_MAX_AGE_SECONDS"""
+        result = self.read_raw(channel)
+        if result is None or time.time() - result[1] > settings.SNAPSHOT_PLANE_MAX_AGE_SECONDS:
+            return None
+        return result[1], result[2]
+
+    def read_snapshot(self, channel: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """(timestamp, parsed payload), decoded at most once per published version per process"""
+        if self.read_fresh(channel) is None:
+            return None
+        sequence, timestamp, payload, parsed = self._cache[channel]
+        if parsed is None:
+            parsed = json.loads(payload)
+            self._cache[channel] = (sequence, timestamp, payload, parsed)
+        return timestamp, parsed
+
+
+class CollectorSupervisor:
+    """Makes sure exactly one collector process is running for all workers.
+
+    The collector holds an exclusive flock on SNAPSHOT_PLANE_LOCK_FILE for its lifetime.
+    Each worker periodically probes the lock; if it is free, the worker spawns a
+    collector. Racing spawns are harmless since the loser cannot take the lock and exits.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._child: Optional[subprocess.Popen] = None
+
+    def start(self) -> bool:
+        if fcntl is None:
+            logger.warning("Snapshot plane requires flock support; collecting in-process instead")
+            return False
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._supervise())
+        return True
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._child is not None and self._child.poll() is None:
+            self._child.terminate()
+        self._child = None
+
+    @staticmethod
+    def collector_running() -> bool:
+        with open(settings.SNAPSHOT_PLANE_LOCK_FILE, "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(lock, fcntl.LOCK_UN)
+            return False
+
+    async def _supervise(self) -> None:
+        while True:
+            try:
+                if self._child is not None and self._child.poll() is not None:
+                    self._child = None  # Reap an exited collector
+                if self._child is None and not self.collector_running():
+                    logger.info("Starting snapshot collector process")
+                    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [BACKEND_DIR, os.environ.get("PYTHONPATH")]))}
+                    # Same cwd as the worker so relative paths in settings resolve identically
+                    self._child = subprocess.Popen([sys.executable, "-m", "app.collector"], env=env)
+            except Exception as e:
+                logger.error("Collector supervision failed: %s", e)
+            await asyncio.sleep(5)
+
+
+def published_payload(channel: str) -> Optional[bytes]:
+    """Fresh JSON bytes from the collector, or None if the plane is off or stale"""
+    if not settings.SNAPSHOT_PLANE_ENABLED:
+        return None
+    result = snapshot_plane.read_fresh(channel)
+    return result[1] if result else None
+
+
+def published_snapshot(channel: str) -> Optional[Tuple[float, Dict[str, Any]]]:
+    """Fresh (timestamp, snapshot) from the collector, or None if the plane is off or stale"""
+    if not settings.SNAPSHOT_PLANE_ENABLED:
+        return None
+    return snapshot_plane.read_snapshot(channel)
+
+
+snapshot_plane = SnapshotPlane(settings.SNAPSHOT_PLANE_NAME, settings.SNAPSHOT_PLANE_CHANNEL_BYTES)
+collector_supervisor = CollectorSupervisor()
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import struct
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from app.config import settings
+from app.instrumentation import TERMINAL_SESSIONS
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows has no PTYs
+    termios = None
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK = 64 * 1024
+# Output chunks queued for a slow client before the PTY stops being read
+MAX_PENDING_CHUNKS = 256
+MAX_DIMENSION = 65535  # Window sizes are unsigned shorts
+
+# Runs in the child after setsid(): make the PTY on stdin its controlling terminal, then
+# exec the shell. Spawning through subprocess avoids a bare fork() in this threaded process.
+ADOPT_TTY = (
+    "import fcntl, os, sys, termios; "
+    "fcntl.ioctl(0, termios.TIOCSCTTY, 0); "
+    "os.execvp(sys.argv[1], sys.argv[1:])"
+)
+
+
+def check_size(cols: int, rows: int) -> None:
+    if not (1 <= cols <= MAX_DIMENSION and 1 <= rows <= MAX_DIMENSION):
+        raise ValueError(f"cols and rows must be between 1 and {MAX_DIMENSION}")
+
+
+class TerminalError(Exception):
+    """Raised when a session cannot be created or attached"""
+
+
+class TerminalSession:
+    """A shell running on a PTY whose output is pumped by the event loop.
+
+    The session outlives its websocket: if the client disconnects the shell keeps
+    running, recent output is kept in a bounded scrollback, and a reconnect with the
+    session id replays it. The shell is killed on exit or after the idle timeout.
+    """
+
+    def __init__(self, owner: str, cols: int, rows: int):
+        self.id = uuid.uuid4().hex
+        self.owner = owner
+        self.created = time.time()
+        self.last_activity = time.monotonic()
+        self.scrollback = bytearray()
+        self.closed = asyncio.Event()
+        self._queue: Optional[asyncio.Queue] = None
+        self._paused = False
+        self._loop = asyncio.get_running_loop()
+        self.proc, self.fd = self._spawn(cols, rows)
+        self.pid = self.proc.pid
+        try:
+            os.set_blocking(self.fd, False)
+            self._loop.add_reader(self.fd, self._on_readable)
+        except BaseException:
+            self._kill(signal.SIGKILL)
+            os.close(self.fd)
+            raise
+
+    @staticmethod
+    def _shell() -> str:
+        return settings.TERMINAL_SHELL or os.environ.get("SHELL") or shutil.which("bash") or "/bin/sh"
+
+    def _spawn(self, cols: int, rows: int):
+        master, slave = os.openpty()
+        try:
+            self._set_size(master, cols, rows)
+            proc = subprocess.Popen(
+                [sys.executable, "-S", "-c", ADOPT_TTY, self._shell()],
+                stdin=slave, stdout=slave, stderr=slave,
+                env={**os.environ, "TERM": "xterm-256color"},
+                start_new_session=True,
+            )
+        except BaseException:
+            os.close(master)
+            raise
+        finally:
+            os.close(slave)
+        return proc, master
+
+    @staticmethod
+    def _set_size(fd: int, cols: int, rows: int) -> None:
+        fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+    def _on_readable(self) -> None:
+        try:
+            data = os.read(self.fd, READ_CHUNK)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""  # EIO: the shell exited and the slave side closed
+        if not data:
+            self.close()
+            return
+        self.last_activity = time.monotonic()
+        self.scrollback += data
+        excess = len(self.scrollback) - settings.TERMINAL_SCROLLBACK_BYTES
+        if excess > 0:
+            del self.scrollback[:excess]
+        if self._queue is not None:
+            self._queue.put_nowait(data)
+            if self._queue.qsize() >= MAX_PENDING_CHUNKS:
+                # Slow client: stop reading so the shell blocks on its own output
+                self._loop.remove_reader(self.fd)
+                self._paused = True
+
+    def attach(self) -> asyncio.Queue:
+        """Queue of output chunks for a newly connected client, starting with the scrollback"""
+        if self._queue is not None:
+            self._queue.put_nowait(None)  # Detach the previous client
+        self._queue = asyncio.Queue()
+        if self.scrollback:
+            self._queue.put_nowait(bytes(self.scrollback))
+        self._resume()
+        return self._queue
+
+    def detach(self, queue: asyncio.Queue) -> None:
+        if self._queue is queue:
+            self._queue = None
+            self._resume()
+
+    def drained(self, queue: asyncio.Queue) -> None:
+        """Called after each chunk is sent; resumes reading once the client catches up"""
+        if self._paused and queue is self._queue and queue.qsize() < MAX_PENDING_CHUNKS // 2:
+            self._resume()
+
+    def _resume(self) -> None:
+        if self._paused and not self.closed.is_set():
+            self._loop.add_reader(self.fd, self._on_readable)
+            self._paused = False
+
+    async def write(self, data: bytes) -> None:
+        self.last_activity = time.monotonic()
+        view = memoryview(data)
+        while view and not self.closed.is_set():
+            try:
+                written = os.write(self.fd, view)
+                view = view[written:]
+            except BlockingIOError:
+                await asyncio.sleep(0.01)
+            except OSError:
+                self.close()
+
+    def resize(self, cols: int, rows: int) -> None:
+        check_size(cols, rows)
+        if not self.closed.is_set():
+            self._set_size(self.fd, cols, rows)
+
+    def close(self) -> None:
+        if self.closed.is_set():
+            return
+        self.closed.set()
+        if not self._paused:
+            self._loop.remove_reader(self.fd)
+        self._kill(signal.SIGHUP)
+        os.close(self.fd)
+        if self._queue is not None:
+            self._queue.put_nowait(None)
+        self._reap(attempts=10)
+
+    def _kill(self, sig: int) -> None:
+        # The shell leads its own session, so this reaches its children too
+        try:
+            os.killpg(self.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def _reap(self, attempts: int) -> None:
+        if self.proc.poll() is not None:
+            return
+        if attempts == 0:
+            self._kill(signal.SIGKILL)
+        self._loop.call_later(0.2, self._reap, max(attempts - 1, 0))
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "owner": self.owner,
+            "pid": self.pid,
+            "created": self.created,
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+            "attached": self._queue is not None,
+        }
+
+
+class TerminalService:
+    """Owns all terminal sessions and closes idle ones"""
+
+    def __init__(self):
+        self.sessions: Dict[str, TerminalSession] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def available(self) -> bool:
+        return termios is not None
+
+    def start(self) -> None:
+        if self._task is None and self.available:
+            self._task = asyncio.get_running_loop().create_task(self._idle_loop())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for session in list(self.sessions.values()):
+            session.close()
+        self._prune()
+
+    def create(self, owner: str, cols: int, rows: int) -> TerminalSession:
+        if not self.available:
+            raise TerminalError("Terminal sessions are not supported on this platform")
+        self._prune()
+        if len(self.sessions) >= settings.TERMINAL_MAX_SESSIONS:
+            raise TerminalError(f"Session limit reached ({settings.TERMINAL_MAX_SESSIONS})")
+        try:
+            check_size(cols, rows)
+            session = TerminalSession(owner, cols, rows)
+        except (ValueError, OSError) as e:
+            raise TerminalError(f"Cannot start terminal: {e}")
+        self.sessions[session.id] = session
+        TERMINAL_SESSIONS.set(len(self.sessions))
+        logger.info("Terminal session %s started for %s (pid %d)", session.id, owner, session.pid)
+        return session
+
+    def get(self, session_id: str, owner: str) -> TerminalSession:
+        session = self.sessions.get(session_id)
+        if session is None or session.closed.is_set() or session.owner != owner:
+            raise TerminalError("Unknown or expired session")
+        return session
+
+    def close(self, session_id: str) -> None:
+        session = self.sessions.get(session_id)
+        if session:
+            session.close()
+        self._prune()
+
+    def list(self, owner: str) -> List[Dict[str, Any]]:
+        self._prune()
+        return [session.info() for session in self.sessions.values() if session.owner == owner]
+
+    def _prune(self) -> None:
+        for session_id in [sid for sid, session in self.sessions.items() if session.closed.is_set()]:
+            del self.sessions[session_id]
+        TERMINAL_SESSIONS.set(len(self.sessions))
+
+    async def _idle_loop(self) -> None:
+        while True:
+            await asyncio.sleep(10)
+            now = time.monotonic()
+            for session in list(self.sessions.values()):
+                if now - session.last_activity > settings.TERMINAL_IDLE_TIMEOUT_SECONDS:
+                    logger.info("Closing idle terminal session %s", session.id)
+                    session.close()
+            self._prune()
+
+
+terminal_service = TerminalService()
@@ -0,0 +1,235 @@
+"""Offline benchmark of the /agent/chat pipeline with a deterministic fake LLM.
+
+Replaces ChatGoogleGenerativeAI with ScriptedLLM, which answers each scenario with a fixed
+pattern of tool calls after a configurable (seeded) delay, and runs the scenarios against a
+generated directory tree. Each chat is split into stages:
+
+    llm       time inside the fake model (the configured latency)
+    tools     time inside tool invoke() calls, also reported per tool
+    overhead  everything else: prompt building, tool lookup, result formatting
+
+A second, shorter pass runs under tracemalloc and reports the peak memory allocated per chat
+and what the pipeline retains. The timing pass runs without tracemalloc so its overhead does
+not skew latencies.
+
+Run from backend/ (no network access or GEMINI_API_KEY needed):
+
+    python -m benchmarks.agent_bench                                # print results
+    python -m benchmarks.agent_bench --tree-depth 4 --wide-files 20000
+    python -m benchmarks.agent_bench --save-baseline                # record agent_baseline.json
+    python -m benchmarks.agent_bench --compare                      # fail on regressions
+"""
+import argparse
+import asyncio
+import json
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from benchmarks.common import compare_to_baseline, load_baseline, percentile, save_results
+from benchmarks.stubs import ScriptedLLM, ScriptStep, TimedTool, install_stub_llm
+
+DEFAULT_BASELINE = Path(__file__).with_name("agent_baseline.json")
+EXTENSIONS = (".log", ".py", ".txt", ".json")
+ERROR_PREFIX = "I encountered an error"
+
+
+def build_tree(root: Path, depth: int, fanout: int, files: int, file_size: int, wide_files: int) -> Dict[str, Any]:
+    """Create a deterministic tree: `fanout` subdirectories per level to `depth`, `files` per
+    directory, plus one flat directory of `wide_files` entries for listing-heavy scenarios"""
+    payload = b"x" * file_size
+    dirs = [root]
+    frontier = [root]
+    for level in range(depth):
+        next_frontier = []
+        for parent in frontier:
+            for index in range(fanout):
+                child = parent / f"dir_{level}_{index}"
+                child.mkdir()
+                next_frontier.append(child)
+        dirs.extend(next_frontier)
+        frontier = next_frontier
+    for directory in dirs:
+        for index in range(files):
+            (directory / f"file_{index:05d}{EXTENSIONS[index % len(EXTENSIONS)]}").write_bytes(payload)
+    wide = root / "wide"
+    wide.mkdir()
+    for index in range(wide_files):
+        (wide / f"entry_{index:06d}{EXTENSIONS[index % len(EXTENSIONS)]}").write_bytes(payload)
+    return {
+        "dirs": len(dirs) + 1,
+        "files": len(dirs) * files + wide_files,
+        "wide_dir": str(wide),
+        "sample_file": str(root / f"file_00001{EXTENSIONS[1]}"),
+    }
+
+
+def make_scenarios(root: Path, tree: Dict[str, Any]) -> Dict[str, List[ScriptStep]]:
+    root_str = str(root)
+    return {
+        "direct_reply": ["All systems nominal."],
+        "list_files": [[("list_files", {"directory": root_str})]],
+        "list_files_wide": [[("list_files", {"directory": tree["wide_dir"]})]],
+        "search_files": [[("search_files", {"pattern": "*.log", "directory": tree["wide_dir"]})]],
+        "search_files_recursive": [[("search_files", {"pattern": "**/*.py", "directory": root_str})]],
+        "file_details": [[("show_file_details", {"filepath": tree["sample_file"]})]],
+        "multi_tool": [[
+            ("get_current_directory", {}),
+            ("list_files", {"directory": root_str}),
+            ("search_files", {"pattern": "*.json", "directory": root_str}),
+        ]],
+        # Falls through the whole tool scan without a match
+        "unknown_tool": [[("no_such_tool", {})]],
+        "system_command": [[("execute_system_command", {"command": f"ls {root_str}"})]],
+    }
+
+
+def _ms(values: List[float], pct: float) -> float:
+    return round(percentile(values, pct) * 1000, 3)
+
+
+async def run_scenario(agent_service, script: List[ScriptStep], args) -> Dict[str, Any]:
+    llm = ScriptedLLM(script, latency=args.llm_latency, jitter=args.llm_jitter, seed=args.seed)
+    install_stub_llm(agent_service, llm)
+    tool_timings: Dict[str, float] = {}
+    agent_service.tools = [TimedTool(tool, tool_timings) for tool in agent_service.tools]
+
+    await agent_service.chat("warmup", args.server_id)
+    tool_timings.clear()
+
+    totals: List[float] = []
+    llm_times: List[float] = []
+    tool_times: List[float] = []
+    overheads: List[float] = []
+    errors = 0
+    response_bytes = 0
+    for _ in range(args.iterations):
+        llm_before = llm.busy_seconds
+        tools_before = sum(tool_timings.values())
+        start = time.perf_counter()
+        response = await agent_service.chat("benchmark", args.server_id)
+        total = time.perf_counter() - start
+        llm_time = llm.busy_seconds - llm_before
+        tool_time = sum(tool_timings.values()) - tools_before
+        totals.append(total)
+        llm_times.append(llm_time)
+        tool_times.append(tool_time)
+        overheads.append(max(total - llm_time - tool_time, 0.0))
+        response_bytes = len(response)
+        if response.startswith(ERROR_PREFIX):
+            errors += 1
+
+    result: Dict[str, Any] = {
+        "requests": len(totals),
+        "errors": errors,
+        "p50_ms": _ms(totals, 50),
+        "p99_ms": _ms(totals, 99),
+        "llm_p50_ms": _ms(llm_times, 50),
+        "tools_p50_ms": _ms(tool_times, 50),
+        "overhead_p50_ms": _ms(overheads, 50),
+        "overhead_p99_ms": _ms(overheads, 99),
+        "response_bytes": response_bytes,
+        "per_tool_mean_ms": {
+            name: round(seconds / len(totals) * 1000, 3) for name, seconds in sorted(tool_timings.items())
+        },
+    }
+    result.update(await measure_allocations(agent_service, args))
+    return result
+
+
+async def measure_allocations(agent_service, args) -> Dict[str, Any]:
+    """Peak bytes allocated during one chat, and what a batch of chats leaves behind"""
+    peaks: List[float] = []
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        for _ in range(args.alloc_iterations):
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+            await agent_service.chat("benchmark", args.server_id)
+            peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+
+    stats = after.compare_to(before, "lineno")
+    top = [
+        f"{stat.traceback[0].filename.rsplit('/', 2)[-1]}:{stat.traceback[0].lineno} "
+        f"{stat.size_diff / 1024:+.1f}KB/{stat.count_diff:+d}"
+        for stat in sorted(stats, key=lambda stat: abs(stat.size_diff), reverse=True)[:args.top_allocations]
+    ]
+    return {
+        "alloc_peak_kb": round(percentile(peaks, 50) / 1024, 1),
+        "alloc_peak_max_kb": round(max(peaks) / 1024, 1) if peaks else 0.0,
+        "retained_kb": round(sum(stat.size_diff for stat in stats) / 1024, 1),
+        "retained_blocks": sum(stat.count_diff for stat in stats),
+        "top_allocations": top,
+    }
+
+
+async def run_all(args, root: Path, tree: Dict[str, Any]) -> Dict[str, Any]:
+    from app.services.agent_service import agent_service
+
+    results: Dict[str, Any] = {}
+    for name, script in make_scenarios(root, tree).items():
+        if args.only and name not in args.only:
+            continue
+        summary = await run_scenario(agent_service, script, args)
+        results[name] = summary
+        print(f"{name:24} {json.dumps(summary)}", flush=True)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--server-id", default="1")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed chats per scenario")
+    parser.add_argument("--alloc-iterations", type=int, default=5, help="Chats per scenario under tracemalloc")
+    parser.add_argument("--top-allocations", type=int, default=3, help="Allocation sites to report")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Fake LLM delay in seconds")
+    parser.add_argument("--llm-jitter", type=float, default=0.0, help="Extra random delay, up to this many seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--tree-depth", type=int, default=3)
+    parser.add_argument("--tree-fanout", type=int, default=4, help="Subdirectories per directory")
+    parser.add_argument("--tree-files", type=int, default=20, help="Files per directory")
+    parser.add_argument("--wide-files", type=int, default=5000, help="Entries in the flat 'wide' directory")
+    parser.add_argument("--file-size", type=int, default=256, help="Bytes per generated file")
+    parser.add_argument("--only", nargs="*", help="Run only the named scenarios")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit non-zero on regressions vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="agent-bench-") as tmp:
+        root = Path(tmp)
+        start = time.perf_counter()
+        tree = build_tree(root, args.tree_depth, args.tree_fanout, args.tree_files, args.file_size, args.wide_files)
+        print(f"Tree: {tree['dirs']} dirs, {tree['files']} files ({time.perf_counter() - start:.1f}s to build)")
+        results = asyncio.run(run_all(args, root, tree))
+
+    if args.output:
+        save_results(args.output, results)
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if not baseline:
+            print(f"No baseline at {args.baseline}")
+            return 1
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions beyond tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+"""Load and latency benchmark for the REST and WebSocket endpoints.
+
+Starts the app in-process under uvicorn (or targets --url), drives each endpoint with a
+fixed number of concurrent clients and reports throughput, p50/p99 latency, websocket
+frame jitter and backend CPU/RSS. /agent/chat runs against a stub LLM, so no network
+access or GEMINI_API_KEY is needed. The in-process server runs with admission control off
+unless --admission is given; requests it rejects (429, or a 1013 close for websockets) are
+reported as "rejected", separately from errors.
+
+Run from backend/ after `pip install -r benchmarks/requirements.txt` (adds httpx):
+
+    python -m benchmarks.api_bench                         # print results
+    python -m benchmarks.api_bench --save-baseline         # record benchmarks/baseline.json
+    python -m benchmarks.api_bench --compare               # fail on regressions vs baseline
+    python -m benchmarks.api_bench --admission             # keep the default admission policies
+"""
+import argparse
+import asyncio
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.common import (
+    ResourceSampler,
+    compare_to_baseline,
+    free_port,
+    load_baseline,
+    save_results,
+    summarize_frames,
+    summarize_latencies,
+)
+
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+
+class InProcessServer:
+    """Runs the FastAPI app under uvicorn on a background thread"""
+
+    def __init__(self, port: int, llm_latency: float, admission: bool = False):
+        import uvicorn
+        from app.config import settings
+        from app.main import app
+        from app.services.agent_service import agent_service
+        from benchmarks.stubs import StubLLM, install_stub_llm
+
+        # The default policies are sized for real clients and would reject most benchmark load
+        settings.ADMISSION_ENABLED = admission
+        install_stub_llm(agent_service, StubLLM(latency=llm_latency))
+        self.url = f"http://127.0.0.1:{port}"
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 15
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError("uvicorn did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+        return False
+
+
+async def drive_http(
+    client: httpx.AsyncClient,
+    make_request: Callable[[httpx.AsyncClient], Any],
+    total: int,
+    concurrency: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    errors = 0
+    rejected = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors, rejected
+        while remaining > 0:
+            remaining -= 1
+            start = time.perf_counter()
+            try:
+                response = await make_request(client)
+                if response.status_code == 429:
+                    rejected += 1
+                    continue
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize_latencies(latencies, time.perf_counter() - start, errors, rejected)
+
+
+async def drive_websockets(url: str, subscribers: int, duration: float, expected_interval: float) -> Dict[str, Any]:
+    intervals: List[float] = []
+    frames = 0
+    failures = 0
+    rejected = 0
+
+    async def subscriber():
+        nonlocal frames, failures, rejected
+        try:
+            async with websockets.connect(url, max_size=None) as ws:
+                deadline = time.perf_counter() + duration
+                last: Optional[float] = None
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(ws.recv(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        break
+                    now = time.perf_counter()
+                    if last is not None:
+                        intervals.append(now - last)
+                    last = now
+                    frames += 1
+        except websockets.ConnectionClosed as e:
+            if e.rcvd is not None and e.rcvd.code == 1013:
+                rejected += 1
+            else:
+                failures += 1
+        except (OSError, websockets.WebSocketException):
+            failures += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(subscriber() for _ in range(subscribers)))
+    result = summarize_frames(intervals, expected_interval, frames, time.perf_counter() - start)
+    result["subscribers"] = subscribers
+    result["failed_subscribers"] = failures
+    result["rejected_subscribers"] = rejected
+    return result
+
+
+async def run_scenarios(base_url: str, args, pid: Optional[int]) -> Dict[str, Any]:
+    from app.auth import create_access_token
+
+    token = create_access_token({"sub": "bench"})
+    headers = {"Authorization": f"Bearer {token}"}
+    server_id = args.server_id
+    ws_url = base_url.replace("http", "ws", 1)
+
+    http_scenarios = {
+        "servers_list": lambda c: c.get("/servers/"),
+        "metrics_snapshot": lambda c: c.get(f"/metrics/{server_id}/snapshot"),
+        "monitoring_snapshot": lambda c: c.get(f"/monitoring/{server_id}/snapshot"),
+        "command_execute": lambda c: c.post(f"/commands/{server_id}/execute", json={"command": "echo bench"}),
+        "agent_chat": lambda c: c.post("/agent/chat", json={"message": "hello", "server_id": server_id}),
+    }
+    ws_scenarios = {
+        "ws_metrics": (f"{ws_url}/ws/metrics/{server_id}", 1.0),
+        "ws_monitoring": (f"{ws_url}/ws/monitoring/{server_id}", 2.0),
+    }
+
+    results: Dict[str, Any] = {}
+    limits = httpx.Limits(max_connections=args.concurrency * 2)
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, timeout=60, limits=limits) as client:
+        for name, make_request in http_scenarios.items():
+            if args.only and name not in args.only:
+                continue
+            with ResourceSampler(pid) as sampler:
+                summary = await drive_http(client, make_request, args.requests, args.concurrency)
+            summary.update(sampler.result)
+            results[name] = summary
+            print(f"{name:22} {json.dumps(summary)}", flush=True)
+
+    for name, (url, interval) in ws_scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        with ResourceSampler(pid) as sampler:
+            summary = await drive_websockets(url, args.subscribers, args.duration, interval)
+        summary.update(sampler.result)
+        results[name] = summary
+        print(f"{name:22} {json.dumps(summary)}", flush=True)
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Benchmark an already running backend instead of starting one")
+    parser.add_argument("--pid", type=int, help="PID of the backend for CPU/RSS sampling when using --url")
+    parser.add_argument("--server-id", default="1")
+    parser.add_argument("--requests", type=int, default=40, help="Requests per HTTP scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--subscribers", type=int, default=20, help="Concurrent clients per websocket scenario")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per websocket scenario")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Stub LLM delay in seconds")
+    parser.add_argument("--admission", action="store_true", help="Keep admission control on for the in-process server")
+    parser.add_argument("--only", nargs="*", help="Run only the named scenarios")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true", help="Exit non-zero on regressions vs the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed regression as a fraction")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    args = parser.parse_args(argv)
+
+    if args.url:
+        results = asyncio.run(run_scenarios(args.url.rstrip("/"), args, args.pid))
+    else:
+        # In-process: CPU/RSS include the benchmark client running in the same process
+        with InProcessServer(free_port(), args.llm_latency, args.admission) as server:
+            results = asyncio.run(run_scenarios(server.url, args, None))
+
+    if args.output:
+        save_results(args.output, results)
+    if args.save_baseline:
+        save_results(args.baseline, results)
+        print(f"Baseline written to {args.baseline}")
+    if args.compare:
+        baseline = load_baseline(args.baseline)
+        if not baseline:
+            print(f"No baseline at {args.baseline}")
+            return 1
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+        print("No regressions beyond tolerance")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
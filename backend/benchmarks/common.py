@@ -0,0 +1,129 @@
+"""Shared helpers for the backend benchmark scripts"""
+import json
+import math
+import socket
+import statistics
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import psutil
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile; returns 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize_latencies(latencies: List[float], elapsed: float, errors: int = 0, rejected: int = 0) -> Dict[str, Any]:
+    """`rejected` counts admission-control 429s, which are not failures of the endpoint itself"""
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "rejected": rejected,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else 0.0,
+    }
+
+
+def summarize_frames(intervals: List[float], expected: float, frames: int, elapsed: float) -> Dict[str, Any]:
+    """Frame cadence for websocket subscribers; jitter is deviation from the expected period"""
+    deviations = [abs(i - expected) for i in intervals]
+    return {
+        "frames": frames,
+        "frames_per_sec": round(frames / elapsed, 2) if elapsed > 0 else 0.0,
+        "interval_p50_ms": round(percentile(intervals, 50) * 1000, 2),
+        "interval_p99_ms": round(percentile(intervals, 99) * 1000, 2),
+        "jitter_mean_ms": round(statistics.fmean(deviations) * 1000, 2) if deviations else 0.0,
+        "jitter_p99_ms": round(percentile(deviations, 99) * 1000, 2),
+    }
+
+
+class ResourceSampler:
+    """Samples CPU and RSS of a process in a background thread while a scenario runs"""
+
+    def __init__(self, pid: Optional[int] = None, interval: float = 0.1):
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._peak_rss = 0
+        self._start_cpu = 0.0
+        self._start_wall = 0.0
+        self.result: Dict[str, Any] = {}
+
+    def _cpu_seconds(self) -> float:
+        times = self.process.cpu_times()
+        return times.user + times.system
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._peak_rss = max(self._peak_rss, self.process.memory_info().rss)
+
+    def __enter__(self):
+        self._peak_rss = self.process.memory_info().rss
+        self._start_cpu = self._cpu_seconds()
+        self._start_wall = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        wall = time.perf_counter() - self._start_wall
+        cpu = self._cpu_seconds() - self._start_cpu
+        self.result = {
+            "cpu_percent": round(cpu / wall * 100, 1) if wall > 0 else 0.0,
+            "peak_rss_mb": round(self._peak_rss / (1024 ** 2), 1),
+        }
+        return False
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_baseline(path: Path) -> Dict[str, Any]:
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def save_results(path: Path, results: Dict[str, Any]) -> None:
+    path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+
+# Metrics where a larger value is better; everything else numeric is "lower is better"
+HIGHER_IS_BETTER = {"throughput_rps", "frames_per_sec"}
+COMPARED_KEYS = {
+    "throughput_rps", "p50_ms", "p99_ms", "frames_per_sec", "jitter_p99_ms", "cpu_percent", "peak_rss_mb",
+    "overhead_p50_ms", "tools_p50_ms", "alloc_peak_kb",
+}
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Return human-readable regressions beyond `tolerance` (fraction, e.g. 0.2 = 20%)"""
+    regressions = []
+    for scenario, metrics in results.items():
+        base = baseline.get(scenario)
+        if not isinstance(base, dict) or not isinstance(metrics, dict):
+            continue
+        for key in COMPARED_KEYS:
+            if key not in metrics or key not in base or not base[key]:
+                continue
+            current, previous = metrics[key], base[key]
+            change = (current - previous) / previous
+            worse = -change if key in HIGHER_IS_BETTER else change
+            if worse > tolerance:
+                regressions.append(f"{scenario}.{key}: {previous} -> {current} ({change:+.0%})")
+    return regressions
@@ -0,0 +1,95 @@
+"""Offline stand-ins for external services used by the benchmarks"""
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+from langchain_core.messages import AIMessage
+
+# A scripted turn: reply text, or a list of (tool name, args) calls
+ScriptStep = Union[str, List[Tuple[str, Dict[str, Any]]]]
+
+
+class StubLLM:
+    """Minimal replacement for the tool-bound Gemini client: fixed reply after a fixed delay"""
+
+    def __init__(self, latency: float = 0.0, reply: str = "stub response"):
+        self.latency = latency
+        self.reply = reply
+
+    def bind_tools(self, tools):
+        return self
+
+    async def ainvoke(self, messages, **kwargs):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return AIMessage(content=self.reply)
+
+
+class ScriptedLLM:
+    """Deterministic fake of the tool-bound Gemini client.
+
+    Each ainvoke returns the next step of `script` (cycling): a string becomes a plain
+    reply, a list of (tool, args) pairs becomes an AIMessage with those tool calls.
+    Latency is `latency` seconds plus up to `jitter` seconds drawn from a seeded RNG, so
+    runs are repeatable. Time spent "in the model" is accumulated in `busy_seconds`.
+    """
+
+    def __init__(self, script: Sequence[ScriptStep], latency: float = 0.0, jitter: float = 0.0, seed: int = 0):
+        self.script = list(script)
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = 0
+        self.busy_seconds = 0.0
+        self._rng = random.Random(seed)
+
+    def bind_tools(self, tools):
+        return self
+
+    def _next_message(self) -> AIMessage:
+        step = self.script[self.calls % len(self.script)]
+        self.calls += 1
+        if isinstance(step, str):
+            return AIMessage(content=step)
+        tool_calls: List[Dict[str, Any]] = [
+            {"name": name, "args": dict(args), "id": f"call_{self.calls}_{index}", "type": "tool_call"}
+            for index, (name, args) in enumerate(step)
+        ]
+        return AIMessage(content="", tool_calls=tool_calls)
+
+    async def ainvoke(self, messages, **kwargs):
+        start = time.perf_counter()
+        delay = self.latency + (self._rng.random() * self.jitter if self.jitter else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+        message = self._next_message()
+        self.busy_seconds += time.perf_counter() - start
+        return message
+
+
+class TimedTool:
+    """Wraps a LangChain tool and accumulates the time spent in invoke, per tool name"""
+
+    def __init__(self, tool, timings: Dict[str, float]):
+        self.tool = tool
+        self.name = tool.name
+        self.timings = timings
+
+    def invoke(self, args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return self.tool.invoke(args, **kwargs)
+        finally:
+            self.timings[self.name] = self.timings.get(self.name, 0.0) + time.perf_counter() - start
+
+    def __getattr__(self, attr):
+        return getattr(self.tool, attr)
+
+
+def install_stub_llm(agent_service, llm) -> None:
+    """Point the agent at `llm` without touching GEMINI_API_KEY or the network"""
+    from app.services.agent_service import AGENT_TOOLS
+
+    agent_service.llm = llm
+    agent_service.tools = list(AGENT_TOOLS)
+    agent_service.llm_with_tools = llm.bind_tools(agent_service.tools)